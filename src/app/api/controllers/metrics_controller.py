@@ -0,0 +1,44 @@
+import secrets
+
+from fastapi import APIRouter, Depends, Request, status
+from fastapi.responses import PlainTextResponse
+from redis.asyncio import Redis
+
+from app.api.schema.shared.errors import ApiError
+from system.metrics.aggregation import collect_metrics
+from system.metrics.registry import render_text
+from system.metrics.settings import MetricsSettings
+from system.redis.connection import get_redis_connection
+from system.settings import get_metrics_settings
+
+metrics_router = APIRouter(prefix="/metrics")
+
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _check_token(
+    request: Request,
+    settings: MetricsSettings = Depends(get_metrics_settings),
+) -> None:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if (
+        settings.token is None
+        or scheme.lower() != "bearer"
+        or not secrets.compare_digest(
+            token.encode(), settings.token.get_secret_value().encode()
+        )
+    ):
+        raise ApiError(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            message="Unauthorized",
+            detail="Missing or invalid metrics token",
+        )
+
+
+@metrics_router.get("", include_in_schema=False, dependencies=[Depends(_check_token)])
+async def get(
+    redis: Redis = Depends(get_redis_connection),
+    settings: MetricsSettings = Depends(get_metrics_settings),
+) -> PlainTextResponse:
+    snapshot = await collect_metrics(redis, settings)
+    return PlainTextResponse(render_text(snapshot), media_type=_CONTENT_TYPE)
@@ -1,8 +1,13 @@
 from logging import Logger
+from typing import AsyncIterator, Sequence
+from uuid import UUID
 
 from fastapi import APIRouter, Depends, status
-from sqlalchemy import func, Select
-from sqlmodel import select, Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row, Select, column, delete, func, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.api.schema.customer_schema import (
     UserSchema,
@@ -10,82 +15,414 @@ from app.api.schema.customer_schema import (
     GetUserResponse,
     CreateUserRequest,
     UpdateUserRequest,
+    BulkCreateUsersRequest,
+    BulkUpdateUsersRequest,
+    BulkDeleteUsersRequest,
+    BulkUsersResponse,
 )
-from app.api.schema.shared.base import CountMeta
+from app.api.schema.shared.base import PageMeta
+from app.api.schema.shared.bulk import BulkItemResult, BulkItemError
+from app.api.schema.shared.counting import CountingParams, get_counting
 from app.api.schema.shared.errors import ApiError
+from app.api.schema.shared.exporting import (
+    ExportParams,
+    get_exporting,
+    encode_export,
+    EXPORT_MEDIA_TYPES,
+)
+from app.api.schema.shared.fieldsets import FieldsetParams, get_fieldset
 from app.api.schema.shared.filtering import FilteringParams, get_filtering
 from app.api.schema.shared.pagination import PaginationParams, get_pagination
+from app.api.schema.shared.responses import SchemaResponse
 from app.api.schema.shared.sorting import get_sorting, SortingParams
 from app.core.models.main.user import User
-from system.database.session import DatabaseSession
+from system.authentication.password_hasher import (
+    PasswordHasher,
+    PasswordHasherBusyError,
+)
+from system.database.count_provider import CountProvider, CountMode
+from system.database.session import AsyncDatabaseSession
 from system.database.settings import DatabaseId
-from system.logging.api_logger import get_request_logger, RequestLog
-import nacl.pwhash
+from system.logging.api_logger import get_request_logger, log_request_input
+from system.redis.entity_cache import EntityCache
 
 user_router = APIRouter(prefix="/users")
 
+_EXPORT_BATCH_SIZE = 1000
+
+BulkUserResult = BulkItemResult[UserSchema]
+
+
+def _get_user_id(user_id: str) -> UUID:
+    """
+    Parse the user_id path parameter, a malformed id is a user not found (rather than a validation error)
+    :param user_id:
+    :return:
+    """
+    try:
+        return UUID(user_id)
+    except ValueError:
+        raise ApiError(
+            status_code=status.HTTP_404_NOT_FOUND,
+            message="User not found",
+            detail=f"User not found with id: {user_id}",
+        ) from None
+
 
-@user_router.get("")
+@user_router.get(
+    "", response_model=GetAllUsersResponse, response_model_exclude_none=True
+)
 async def get_all(
     logger: Logger = Depends(get_request_logger),
-    main_database_session: Session = Depends(DatabaseSession(DatabaseId.MAIN)),
+    main_database_session: AsyncSession = Depends(
+        AsyncDatabaseSession(DatabaseId.MAIN, read_only=True)
+    ),
     filtering: FilteringParams = Depends(get_filtering),
     sorting: SortingParams = Depends(get_sorting),
     pagination: PaginationParams = Depends(get_pagination(100, 300)),
-) -> GetAllUsersResponse:
-    logger.debug(
-        RequestLog(
-            input={
-                "filtering": filtering,
-                "sorting": sorting,
-                "pagination": pagination,
-            }
-        )
+    counting: CountingParams = Depends(get_counting),
+    fieldset: FieldsetParams = Depends(get_fieldset),
+    count_provider: CountProvider = Depends(),
+) -> SchemaResponse:
+    log_request_input(
+        logger,
+        {
+            "filtering": filtering,
+            "sorting": sorting,
+            "pagination": pagination,
+            "counting": counting,
+            "fieldset": fieldset,
+        },
     )
 
-    data = main_database_session.exec(
+    fields = UserSchema.resolve_fieldset(fieldset.names)
+
+    count_mode = counting.count
+    if count_mode == CountMode.WINDOW and (pagination.after or pagination.before):
+        # The window would only count the rows after the cursor
+        count_mode = CountMode.EXACT
+
+    data, count = await count_provider.fetch_with_count(
+        main_database_session,
         UserSchema.build_query(
-            select(User),
+            select(*UserSchema.get_projection(User, fields, sorting.order_by)),
             pagination.skip,
-            pagination.limit,
+            pagination.limit + 1,
             filtering.where,
             sorting.order_by,
+            pagination.after,
+            pagination.before,
+        ),
+        UserSchema.build_query(
+            select(User.id), where=filtering.where, record_usage=False
+        ),
+        count_mode,
+        # Only the cached counts need the key, built from the values of the rules
+        (
+            UserSchema.get_filter_key(filtering.where)
+            if count_mode == CountMode.CACHED
+            else None
+        ),
+    )
+    data, next_cursor, previous_cursor = UserSchema.get_page(
+        data, pagination, sorting.order_by
+    )
+
+    # Serialized once, by pydantic-core, instead of validated again and serialized twice by FastAPI
+    return SchemaResponse(
+        GetAllUsersResponse.model_construct(
+            data=UserSchema.from_rows(data, fields),
+            meta=PageMeta.model_construct(
+                count=count,
+                next_cursor=next_cursor,
+                previous_cursor=previous_cursor,
+            ),
+        ),
+        exclude_none=True,
+        include={"data": {"__all__": fields}, "meta": True} if fields else None,
+    )
+
+
+@user_router.get("/export")
+async def export(
+    logger: Logger = Depends(get_request_logger),
+    filtering: FilteringParams = Depends(get_filtering),
+    sorting: SortingParams = Depends(get_sorting),
+    exporting: ExportParams = Depends(get_exporting),
+) -> StreamingResponse:
+    log_request_input(
+        logger,
+        {
+            "filtering": filtering,
+            "sorting": sorting,
+            "exporting": exporting,
+        },
+    )
+
+    data_query = UserSchema.build_query(
+        select(User.id, User.name, User.email, User.phone, User.address),
+        where=filtering.where,
+        order_by=sorting.order_by,
+    ).execution_options(yield_per=_EXPORT_BATCH_SIZE)
+
+    # The response is streamed after the dependencies are closed, so it uses a session of its own
+    async def fetch_partitions() -> AsyncIterator[Sequence[Row]]:
+        async with AsyncDatabaseSession.get(
+            DatabaseId.MAIN, read_only=True
+        ) as database_session:
+            result = await database_session.stream(data_query)
+            async for partition in result.partitions():
+                yield partition
+
+    return StreamingResponse(
+        encode_export(UserSchema, fetch_partitions(), exporting.format),
+        media_type=EXPORT_MEDIA_TYPES[exporting.format],
+        headers={
+            "Content-Disposition": f'attachment; filename="users.{exporting.format.value}"'
+        },
+    )
+
+
+@user_router.post("/bulk", response_model_exclude_none=True)
+async def bulk_create(
+    body: BulkCreateUsersRequest,
+    logger: Logger = Depends(get_request_logger),
+    main_database_session: AsyncSession = Depends(
+        AsyncDatabaseSession(DatabaseId.MAIN)
+    ),
+    password_hasher: PasswordHasher = Depends(),
+) -> BulkUsersResponse:
+    log_request_input(logger, {"body": body})
+
+    try:
+        password_hashes = await password_hasher.hash_many(
+            [item.password for item in body.data]
+        )
+    except PasswordHasherBusyError as e:
+        raise ApiError(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message="Service busy",
+            detail=str(e),
         )
-    ).all()
 
-    count = main_database_session.exec(
-        UserSchema.build_query(
-            select(func.count(User.id)),
-            where=filtering.where,
+    users = [
+        User(
+            name=item.name,
+            email=item.email,
+            phone=item.phone,
+            address=item.address,
+            password_hash=password_hash,
         )
-    ).one()
+        for item, password_hash in zip(body.data, password_hashes)
+    ]
 
-    return GetAllUsersResponse(
+    # The users whose email already exists (even earlier in the same request) are skipped
+    inserted_ids = set(
+        (
+            await main_database_session.exec(
+                insert(User)
+                .values([user.model_dump() for user in users])
+                .on_conflict_do_nothing(index_elements=[User.email])
+                .returning(User.id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    return BulkUsersResponse(
         data=[
-            UserSchema(
-                id=d.id,
-                name=d.name,
-                email=d.email,
-                phone=d.phone,
-                address=d.address,
+            (
+                BulkUserResult(
+                    index=i,
+                    status=status.HTTP_201_CREATED,
+                    data=UserSchema.model_validate(user),
+                )
+                if user.id in inserted_ids
+                else BulkUserResult(
+                    index=i,
+                    status=status.HTTP_409_CONFLICT,
+                    error=BulkItemError(
+                        message="User already exists",
+                        detail=f"User already exists with email: {user.email}",
+                    ),
+                )
             )
-            for d in data
-        ],
-        meta=CountMeta(
-            count=count,
-        ),
+            for i, user in enumerate(users)
+        ]
     )
 
 
-@user_router.get("/{user_id}")
+@user_router.patch("/bulk", response_model_exclude_none=True)
+async def bulk_update(
+    body: BulkUpdateUsersRequest,
+    logger: Logger = Depends(get_request_logger),
+    main_database_session: AsyncSession = Depends(
+        AsyncDatabaseSession(DatabaseId.MAIN)
+    ),
+    entity_cache: EntityCache = Depends(),
+) -> BulkUsersResponse:
+    log_request_input(logger, {"body": body})
+
+    first_indexes: dict[UUID, int] = {}
+    for i, item in enumerate(body.data):
+        first_indexes.setdefault(item.id, i)
+    items = [body.data[i] for i in first_indexes.values()]
+
+    changes = (
+        values(
+            column("id", User.id.type),
+            column("name", User.name.type),
+            column("phone", User.phone.type),
+            column("address", User.address.type),
+            name="changes",
+        )
+        .data([(item.id, item.name, item.phone, item.address) for item in items])
+        .alias("changes")
+    )
+    # The fields that are not specified keep their current value
+    updated_users = {
+        row.id: row
+        for row in (
+            await main_database_session.exec(
+                update(User)
+                .where(User.id == changes.c.id)
+                .values(
+                    name=func.coalesce(changes.c.name, User.name),
+                    phone=func.coalesce(changes.c.phone, User.phone),
+                    address=func.coalesce(changes.c.address, User.address),
+                )
+                .returning(User.id, User.name, User.email, User.phone, User.address)
+                .execution_options(synchronize_session=False)
+            )
+        ).all()
+    }
+
+    await main_database_session.commit()
+    await entity_cache.invalidate_many(UserSchema, list(updated_users))
+
+    results = []
+    for i, item in enumerate(body.data):
+        if first_indexes[item.id] != i:
+            results.append(
+                BulkUserResult(
+                    index=i,
+                    status=status.HTTP_409_CONFLICT,
+                    error=BulkItemError(
+                        message="Duplicate user",
+                        detail=f"User already updated by the request with id: {item.id}",
+                    ),
+                )
+            )
+        elif item.id in updated_users:
+            results.append(
+                BulkUserResult(
+                    index=i,
+                    status=status.HTTP_200_OK,
+                    data=UserSchema.model_validate(updated_users[item.id]),
+                )
+            )
+        else:
+            results.append(
+                BulkUserResult(
+                    index=i,
+                    status=status.HTTP_404_NOT_FOUND,
+                    error=BulkItemError(
+                        message="User not found",
+                        detail=f"User not found with id: {item.id}",
+                    ),
+                )
+            )
+
+    return BulkUsersResponse(data=results)
+
+
+@user_router.delete("/bulk", response_model_exclude_none=True)
+async def bulk_delete(
+    body: BulkDeleteUsersRequest,
+    logger: Logger = Depends(get_request_logger),
+    main_database_session: AsyncSession = Depends(
+        AsyncDatabaseSession(DatabaseId.MAIN)
+    ),
+    entity_cache: EntityCache = Depends(),
+) -> BulkUsersResponse:
+    log_request_input(logger, {"body": body})
+
+    first_indexes: dict[UUID, int] = {}
+    for i, user_id in enumerate(body.data):
+        first_indexes.setdefault(user_id, i)
+
+    deleted_users = {
+        row.id: row
+        for row in (
+            await main_database_session.exec(
+                delete(User)
+                .where(User.id.in_(list(first_indexes)))
+                .returning(User.id, User.name, User.email, User.phone, User.address)
+                .execution_options(synchronize_session=False)
+            )
+        ).all()
+    }
+
+    await main_database_session.commit()
+    await entity_cache.invalidate_many(UserSchema, list(deleted_users))
+
+    results = []
+    for i, user_id in enumerate(body.data):
+        if first_indexes[user_id] != i:
+            results.append(
+                BulkUserResult(
+                    index=i,
+                    status=status.HTTP_409_CONFLICT,
+                    error=BulkItemError(
+                        message="Duplicate user",
+                        detail=f"User already deleted by the request with id: {user_id}",
+                    ),
+                )
+            )
+        elif user_id in deleted_users:
+            results.append(
+                BulkUserResult(
+                    index=i,
+                    status=status.HTTP_200_OK,
+                    data=UserSchema.model_validate(deleted_users[user_id]),
+                )
+            )
+        else:
+            results.append(
+                BulkUserResult(
+                    index=i,
+                    status=status.HTTP_404_NOT_FOUND,
+                    error=BulkItemError(
+                        message="User not found",
+                        detail=f"User not found with id: {user_id}",
+                    ),
+                )
+            )
+
+    return BulkUsersResponse(data=results)
+
+
+@user_router.get("/{user_id}", response_model=GetUserResponse)
 async def get(
-    user_id: str,
+    user_id: UUID = Depends(_get_user_id),
     logger: Logger = Depends(get_request_logger),
-    main_database_session: Session = Depends(DatabaseSession(DatabaseId.MAIN)),
-) -> GetUserResponse:
-    logger.debug(RequestLog(input={"user_id": user_id}))
+    main_database_session: AsyncSession = Depends(
+        AsyncDatabaseSession(DatabaseId.MAIN, read_only=True)
+    ),
+    entity_cache: EntityCache = Depends(),
+) -> SchemaResponse:
+    log_request_input(logger, {"user_id": user_id})
 
-    data = main_database_session.get(User, user_id)
+    user = await entity_cache.get(UserSchema, user_id)
+    if user is not None:
+        return SchemaResponse(GetUserResponse.model_construct(data=user))
+
+    data = (
+        await main_database_session.exec(
+            select(*UserSchema.get_projection(User)).where(User.id == user_id)
+        )
+    ).first()
     if not data:
         raise ApiError(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -93,27 +430,25 @@ async def get(
             detail=f"User not found with id: {user_id}",
         )
 
-    return GetUserResponse(
-        data=UserSchema(
-            id=data.id,
-            name=data.name,
-            email=data.email,
-            phone=data.phone,
-            address=data.address,
-        )
-    )
+    user = UserSchema(**data._mapping)
+    await entity_cache.set(user, user_id)
+
+    return SchemaResponse(GetUserResponse.model_construct(data=user))
 
 
 @user_router.post("", status_code=status.HTTP_201_CREATED)
 async def create(
     body: CreateUserRequest,
     logger: Logger = Depends(get_request_logger),
-    main_database_session: Session = Depends(DatabaseSession(DatabaseId.MAIN)),
+    main_database_session: AsyncSession = Depends(
+        AsyncDatabaseSession(DatabaseId.MAIN)
+    ),
+    password_hasher: PasswordHasher = Depends(),
 ) -> GetUserResponse:
-    logger.debug(RequestLog(input={"body": body}))
+    log_request_input(logger, {"body": body})
 
     data_query: Select = select(User).where(User.email == body.email)
-    data = main_database_session.exec(data_query).first()
+    data = (await main_database_session.exec(data_query)).first()
     if data:
         raise ApiError(
             status_code=status.HTTP_409_CONFLICT,
@@ -121,12 +456,21 @@ async def create(
             detail=f"User already exists with email: {body.email}",
         )
 
+    try:
+        password_hash = await password_hasher.hash(body.password)
+    except PasswordHasherBusyError as e:
+        raise ApiError(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message="Service busy",
+            detail=str(e),
+        )
+
     data = User(
         name=body.name,
         email=body.email,
         phone=body.phone,
         address=body.address,
-        password_hash=nacl.pwhash.str(body.password.encode()).decode(),
+        password_hash=password_hash,
     )
     main_database_session.add(data)
 
@@ -143,14 +487,17 @@ async def create(
 
 @user_router.put("/{user_id}")
 async def update(
-    user_id: str,
     body: UpdateUserRequest,
+    user_id: UUID = Depends(_get_user_id),
     logger: Logger = Depends(get_request_logger),
-    main_database_session: Session = Depends(DatabaseSession(DatabaseId.MAIN)),
+    main_database_session: AsyncSession = Depends(
+        AsyncDatabaseSession(DatabaseId.MAIN)
+    ),
+    entity_cache: EntityCache = Depends(),
 ) -> GetUserResponse:
-    logger.debug(RequestLog(input={"user_id": user_id, "body": body}))
+    log_request_input(logger, {"user_id": user_id, "body": body})
 
-    data = main_database_session.get(User, user_id)
+    data = await main_database_session.get(User, user_id)
     if not data:
         raise ApiError(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -162,26 +509,34 @@ async def update(
     data.phone = body.phone
     data.address = body.address
 
-    return GetUserResponse(
-        data=UserSchema(
-            id=data.id,
-            name=data.name,
-            email=data.email,
-            phone=data.phone,
-            address=data.address,
-        )
+    user = UserSchema(
+        id=data.id,
+        name=data.name,
+        email=data.email,
+        phone=data.phone,
+        address=data.address,
     )
 
+    # Committed before invalidating, so that the reads after the invalidation get the new data
+    # (the reads started before it cannot cache the previous data, see EntityCache)
+    await main_database_session.commit()
+    await entity_cache.invalidate(UserSchema, user_id)
+
+    return GetUserResponse(data=user)
+
 
 @user_router.delete("/{user_id}")
 async def delete(
-    user_id: str,
+    user_id: UUID = Depends(_get_user_id),
     logger: Logger = Depends(get_request_logger),
-    main_database_session: Session = Depends(DatabaseSession(DatabaseId.MAIN)),
+    main_database_session: AsyncSession = Depends(
+        AsyncDatabaseSession(DatabaseId.MAIN)
+    ),
+    entity_cache: EntityCache = Depends(),
 ) -> GetUserResponse:
-    logger.debug(RequestLog(input={"user_id": user_id}))
+    log_request_input(logger, {"user_id": user_id})
 
-    data = main_database_session.get(User, user_id)
+    data = await main_database_session.get(User, user_id)
     if not data:
         raise ApiError(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -189,14 +544,19 @@ async def delete(
             detail=f"User not found with id: {user_id}",
         )
 
-    main_database_session.delete(data)
+    await main_database_session.delete(data)
 
-    return GetUserResponse(
-        data=UserSchema(
-            id=data.id,
-            name=data.name,
-            email=data.email,
-            phone=data.phone,
-            address=data.address,
-        )
+    user = UserSchema(
+        id=data.id,
+        name=data.name,
+        email=data.email,
+        phone=data.phone,
+        address=data.address,
     )
+
+    # Committed before invalidating, so that the reads after the invalidation get the new data
+    # (the reads started before it cannot cache the previous data, see EntityCache)
+    await main_database_session.commit()
+    await entity_cache.invalidate(UserSchema, user_id)
+
+    return GetUserResponse(data=user)
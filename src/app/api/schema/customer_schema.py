@@ -1,7 +1,12 @@
-from app.api.schema.shared.base import CountMeta, BaseSchema
+from uuid import UUID
+
+from pydantic import Field as PydanticField
+
+from app.api.schema.shared.base import PageMeta, BaseSchema
+from app.api.schema.shared.bulk import BulkItemResult, BULK_MAX_ITEMS
 from app.api.schema.shared.entities import BaseEntitySchema
 from app.core.models.main.user import User
-from system.query_builder import Field
+from system.query_builder import Field, ALL_OPERATORS, TEXT_OPERATORS
 
 
 class UserSchema(BaseEntitySchema):
@@ -13,7 +18,7 @@ class UserSchema(BaseEntitySchema):
     @staticmethod
     def get_query_builder_fields() -> list[Field]:
         return [
-            Field("id", User.id),
+            Field("id", User.id, operators=ALL_OPERATORS - TEXT_OPERATORS),
             Field("email", User.email),
             Field("name", User.name),
         ]
@@ -21,7 +26,7 @@ class UserSchema(BaseEntitySchema):
 
 class GetAllUsersResponse(BaseSchema):
     data: list[UserSchema]
-    meta: CountMeta
+    meta: PageMeta
 
 
 class GetUserResponse(BaseSchema):
@@ -37,3 +42,30 @@ class UpdateUserRequest(BaseSchema):
 class CreateUserRequest(UpdateUserRequest):
     email: str
     password: str
+
+
+class BulkCreateUsersRequest(BaseSchema):
+    data: list[CreateUserRequest] = PydanticField(
+        ..., min_length=1, max_length=BULK_MAX_ITEMS
+    )
+
+
+class BulkUpdateUserRequest(BaseSchema):
+    id: UUID
+    name: str | None = None
+    phone: str | None = None
+    address: str | None = None
+
+
+class BulkUpdateUsersRequest(BaseSchema):
+    data: list[BulkUpdateUserRequest] = PydanticField(
+        ..., min_length=1, max_length=BULK_MAX_ITEMS
+    )
+
+
+class BulkDeleteUsersRequest(BaseSchema):
+    data: list[UUID] = PydanticField(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class BulkUsersResponse(BaseSchema):
+    data: list[BulkItemResult[UserSchema]]
@@ -11,4 +11,9 @@ class BaseSchema(BaseModel):
 
 
 class CountMeta(BaseSchema):
-    count: int
+    count: int | None = None
+
+
+class PageMeta(CountMeta):
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
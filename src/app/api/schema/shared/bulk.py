@@ -0,0 +1,21 @@
+from typing import Generic, TypeVar
+
+from app.api.schema.shared.base import BaseSchema
+
+BULK_MAX_ITEMS = 100
+
+_TData = TypeVar("_TData")
+
+
+class BulkItemError(BaseSchema):
+    message: str
+    detail: str
+
+
+class BulkItemResult(BaseSchema, Generic[_TData]):
+    index: int
+    """Position of the item in the request"""
+    status: int
+    """HTTP status code of the operation on the item"""
+    data: _TData | None = None
+    error: BulkItemError | None = None
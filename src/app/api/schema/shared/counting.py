@@ -0,0 +1,14 @@
+from typing import Annotated
+
+from fastapi import Query
+from pydantic import BaseModel, Field
+
+from system.database.count_provider import CountMode
+
+
+class CountingParams(BaseModel):
+    count: CountMode = Field(CountMode.EXACT)
+
+
+def get_counting(counting: Annotated[CountingParams, Query()]) -> CountingParams:
+    return counting
@@ -1,28 +1,271 @@
+import hashlib
 from abc import abstractmethod
+from typing import Any, ClassVar, Hashable, Self, Sequence
 from uuid import UUID
 
-from sqlalchemy import Select
+import orjson
+from sqlalchemy import Select, and_, or_, tuple_, bindparam
 from starlette import status
 
 from app.api.schema.shared.base import BaseSchema
 from app.api.schema.shared.errors import ApiError
+from app.api.schema.shared.pagination import (
+    PaginationParams,
+    encode_cursor,
+    decode_cursor,
+)
+from system.database.operator_usage import record_operator_usage
+from system.database.query_timing import QUERY_FINGERPRINT_OPTION
 from system.query_builder import (
     Field,
     WhereRule,
     OrderByRule,
     EngineContext,
     QueryBuilderSyntaxError,
+    QueryBuilderUnknownFieldError,
+    CompiledRulesCache,
 )
 
+_SortKey = tuple[Field, bool]
+"""Field of the sort key and whether it is sorted in descending order"""
+
 
 class BaseEntitySchema(BaseSchema):
     id: UUID
 
+    compiled_rules_cache: ClassVar[CompiledRulesCache] = CompiledRulesCache()
+    """Compiled where and order by rules, shared by all the entity schemas"""
+
     @staticmethod
     @abstractmethod
     def get_query_builder_fields() -> list[Field]:
         raise NotImplementedError()
 
+    @classmethod
+    def get_rules_fingerprint(
+        cls,
+        where: WhereRule | None = None,
+        order_by: list[OrderByRule] | None = None,
+    ) -> Hashable:
+        return (
+            cls.__name__,
+            where.fingerprint() if where else None,
+            tuple(rule.fingerprint() for rule in order_by) if order_by else None,
+        )
+
+    @classmethod
+    def get_query_fingerprint(
+        cls,
+        where: WhereRule | None = None,
+        order_by: list[OrderByRule] | None = None,
+    ) -> str:
+        """
+        Short identifier of the shape of the where and order by rules (values excluded),
+        e.g. to group the statements of the slow query log.
+        """
+        fingerprint = repr(cls.get_rules_fingerprint(where, order_by)).encode()
+        return f"{cls.__name__}:{hashlib.sha256(fingerprint).hexdigest()[:16]}"
+
+    @classmethod
+    def get_filter_key(cls, where: WhereRule | None = None) -> str:
+        """
+        Key identifying the rows selected by the where rule, values included,
+        e.g. to cache results computed on the filtered rows.
+        """
+        try:
+            engine_context = EngineContext(cls.get_query_builder_fields())
+            if where:
+                where.bind_params(engine_context)
+        except QueryBuilderSyntaxError as e:
+            raise ApiError(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                message="Invalid query builder syntax",
+                detail=str(e),
+            )
+
+        key = orjson.dumps(
+            [repr(cls.get_rules_fingerprint(where)), engine_context.params],
+            default=str,
+            option=orjson.OPT_SORT_KEYS,
+        )
+        return f"{cls.__name__}:{hashlib.sha256(key).hexdigest()}"
+
+    @classmethod
+    def resolve_fieldset(cls, names: list[str] | None) -> set[str] | None:
+        """
+        Resolve the fields requested for the response (sparse fieldset), by name or by alias,
+        to the names of the schema fields. The id is always included.
+        :param names: the requested fields, None for all of them
+        :return: the names of the fields, None for all of them
+        """
+        if names is None:
+            return None
+
+        field_names = {}
+        for name, field in cls.model_fields.items():
+            field_names[name] = name
+            if field.alias:
+                field_names[field.alias] = name
+
+        fieldset = {"id"}
+        for name in names:
+            if name not in field_names:
+                raise ApiError(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    message="Invalid fields",
+                    detail=f"Unknown field: {name}",
+                )
+            fieldset.add(field_names[name])
+        return fieldset
+
+    @classmethod
+    def get_projection(
+        cls,
+        model: type,
+        fieldset: set[str] | None = None,
+        order_by: list[OrderByRule] | None = None,
+    ) -> list[Any]:
+        """
+        Columns of the model to select for the schema: its fields (only those of the fieldset, if given)
+        and the sort keys, which the cursors of the page are built from (see get_page).
+        Selecting them instead of the model skips the other columns and the ORM entities.
+        :param model: the model with a column named after each field of the schema
+        :param fieldset: the fields of the response, from resolve_fieldset
+        :param order_by:
+        :return:
+        """
+        columns = [
+            getattr(model, name)
+            for name in cls.model_fields
+            if fieldset is None or name in fieldset
+        ]
+
+        try:
+            sort_keys = cls._get_sort_keys(
+                EngineContext(cls.get_query_builder_fields()), order_by
+            )
+        except QueryBuilderSyntaxError as e:
+            raise ApiError(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                message="Invalid query builder syntax",
+                detail=str(e),
+            )
+
+        keys = {column.key for column in columns}
+        for field, _ in sort_keys:
+            if field.database_column.key not in keys:
+                keys.add(field.database_column.key)
+                columns.append(field.database_column)
+        return columns
+
+    @classmethod
+    def from_rows(
+        cls, rows: Sequence[Any], fieldset: set[str] | None = None
+    ) -> list[Self]:
+        """
+        Build the schemas from the rows of a query selecting get_projection, the other columns are ignored.
+        With a fieldset the schemas only have its fields, so they are built without validation
+        and must be serialized including only them.
+        :param rows:
+        :param fieldset: the fields of the response, from resolve_fieldset
+        :return:
+        """
+        if fieldset is None:
+            return [cls(**row._mapping) for row in rows]
+        return [cls.model_construct(**row._mapping) for row in rows]
+
+    @classmethod
+    def _compile_rules(
+        cls,
+        engine_context: EngineContext,
+        where: WhereRule | None,
+        order_by: list[OrderByRule] | None,
+    ) -> tuple[Any | None, list]:
+        fingerprint = cls.get_rules_fingerprint(where, order_by)
+
+        compiled_rules = cls.compiled_rules_cache.get(fingerprint)
+        if compiled_rules is not None:
+            if where:
+                where.bind_params(engine_context)
+            return compiled_rules
+
+        compiled_where = where.compile(engine_context) if where else None
+        compiled_order_by = (
+            [rule.compile(engine_context) for rule in order_by] if order_by else []
+        )
+        compiled_rules = (compiled_where, compiled_order_by)
+
+        cls.compiled_rules_cache.put(fingerprint, compiled_rules)
+        return compiled_rules
+
+    @classmethod
+    def _get_sort_keys(
+        cls,
+        engine_context: EngineContext,
+        order_by: list[OrderByRule] | None,
+    ) -> list[_SortKey]:
+        """
+        Sort keys of a page, made unique by the id used as tie-breaker.
+        """
+        sort_keys = []
+        for rule in order_by or []:
+            try:
+                field = engine_context.fields[rule.field]
+            except KeyError as e:
+                raise QueryBuilderUnknownFieldError(rule.field) from e
+            sort_keys.append((field, rule.direction == "desc"))
+
+        if not any(field.name == "id" for field, _ in sort_keys):
+            sort_keys.append((engine_context.fields["id"], False))
+        return sort_keys
+
+    @staticmethod
+    def _build_seek_condition(
+        engine_context: EngineContext,
+        sort_keys: list[_SortKey],
+        cursor: str,
+        backwards: bool,
+    ) -> Any:
+        """
+        Build the condition selecting the rows after (or before, if backwards) the cursor,
+        so that the database can seek on the sort index instead of scanning the skipped rows.
+        """
+        try:
+            values = decode_cursor(cursor)
+        except ValueError as e:
+            raise QueryBuilderSyntaxError(f"Invalid cursor: {cursor}") from e
+        if len(values) != len(sort_keys):
+            raise QueryBuilderSyntaxError(
+                f"Cursor does not match the sort order: {cursor}"
+            )
+
+        params = []
+        for (field, _), value in zip(sort_keys, values):
+            transformed_value = field.transform(value)
+            # Typed after the column, the type of the value (e.g. str for a uuid) has no comparison with it
+            params.append(
+                bindparam(
+                    engine_context.add_param(field, transformed_value),
+                    transformed_value,
+                    type_=field.database_column.type,
+                )
+            )
+        columns = [field.database_column for field, _ in sort_keys]
+        greater = [descending == backwards for _, descending in sort_keys]
+
+        # With a single direction the row value comparison can use a composite index
+        if all(greater):
+            return tuple_(*columns) > tuple_(*params)
+        if not any(greater):
+            return tuple_(*columns) < tuple_(*params)
+
+        conditions = []
+        for i, (column, param) in enumerate(zip(columns, params)):
+            equals = [c == p for c, p in zip(columns[:i], params[:i])]
+            compare = column > param if greater[i] else column < param
+            conditions.append(and_(*equals, compare))
+        return or_(*conditions)
+
     @classmethod
     def build_query(
         cls,
@@ -31,22 +274,75 @@ class BaseEntitySchema(BaseSchema):
         limit: int | None = None,
         where: WhereRule | None = None,
         order_by: list[OrderByRule] | None = None,
+        after: str | None = None,
+        before: str | None = None,
+        record_usage: bool = True,
     ) -> Select:
+        """
+        Build the query applying the filtering, sorting and pagination rules.
+        When a limit is given, the id is appended to the sort order as tie-breaker,
+        so that the pages are stable and can be navigated with cursors.
+        With before, the rows are returned in reverse order (see get_page).
+        The operators of the rules are counted for the index advisor unless record_usage is False,
+        for the queries of a request built from the same rules (e.g. the count query of a page).
+        """
         try:
+            if after and before:
+                raise QueryBuilderSyntaxError(
+                    "Only one of after and before can be specified"
+                )
+
             engine_context = EngineContext(cls.get_query_builder_fields())
+            compiled_where, compiled_order_by = cls._compile_rules(
+                engine_context, where, order_by
+            )
+            if record_usage:
+                record_operator_usage(engine_context.fields, where, order_by)
 
             if skip:
                 base_query = base_query.offset(skip)
             if limit:
                 base_query = base_query.limit(limit)
-            if where:
-                compiled_where = where.compile(engine_context)
-                base_query = base_query.where(compiled_where)
-            if order_by:
-                compiled_order_by = [rule.compile(engine_context) for rule in order_by]
+            if compiled_where is not None:
+                # Only the (shared) where expression is cloned to bind the values,
+                # binding them on the whole query would clone all of it
+                base_query = base_query.where(
+                    compiled_where.params(engine_context.params)
+                )
+
+            if limit or after or before:
+                sort_keys = cls._get_sort_keys(engine_context, order_by)
+                if after or before:
+                    base_query = base_query.where(
+                        cls._build_seek_condition(
+                            engine_context, sort_keys, after or before, bool(before)
+                        )
+                    )
+                if before:
+                    base_query = base_query.order_by(
+                        *[
+                            (
+                                field.database_column.asc()
+                                if descending
+                                else field.database_column.desc()
+                            )
+                            for field, descending in sort_keys
+                        ]
+                    )
+                else:
+                    base_query = base_query.order_by(
+                        *compiled_order_by,
+                        *[
+                            field.database_column
+                            for field, _ in sort_keys[len(compiled_order_by) :]
+                        ],
+                    )
+            elif compiled_order_by:
                 base_query = base_query.order_by(*compiled_order_by)
 
-            base_query = base_query.params(engine_context.params)
+            base_query = base_query.execution_options(
+                **{QUERY_FINGERPRINT_OPTION: cls.get_query_fingerprint(where, order_by)}
+            )
 
             return base_query
         except QueryBuilderSyntaxError as e:
@@ -55,3 +351,44 @@ class BaseEntitySchema(BaseSchema):
                 message="Invalid query builder syntax",
                 detail=str(e),
             )
+
+    @classmethod
+    def get_page(
+        cls,
+        rows: Sequence[Any],
+        pagination: PaginationParams,
+        order_by: list[OrderByRule] | None = None,
+    ) -> tuple[list[Any], str | None, str | None]:
+        """
+        Build the page from the rows of a query built with a limit of pagination.limit + 1,
+        the extra row only telling whether there are more rows.
+        :param rows:
+        :param pagination:
+        :param order_by:
+        :return: the rows of the page, the next and the previous cursor
+        """
+        engine_context = EngineContext(cls.get_query_builder_fields())
+        sort_keys = cls._get_sort_keys(engine_context, order_by)
+
+        has_more = len(rows) > pagination.limit
+        page = list(rows[: pagination.limit])
+        if pagination.before:
+            page.reverse()
+
+        if not page:
+            return page, None, None
+
+        def get_cursor(row: Any) -> str:
+            return encode_cursor(
+                [getattr(row, field.database_column.key) for field, _ in sort_keys]
+            )
+
+        if pagination.before:
+            has_next, has_previous = True, has_more
+        else:
+            has_next = has_more
+            has_previous = bool(pagination.after or pagination.skip)
+
+        next_cursor = get_cursor(page[-1]) if has_next else None
+        previous_cursor = get_cursor(page[0]) if has_previous else None
+        return page, next_cursor, previous_cursor
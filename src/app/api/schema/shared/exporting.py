@@ -0,0 +1,65 @@
+import csv
+import io
+from enum import Enum
+from typing import Annotated, Any, AsyncIterator, Sequence
+
+import orjson
+from fastapi import Query
+from pydantic import BaseModel, Field
+
+from app.api.schema.shared.base import BaseSchema
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+EXPORT_MEDIA_TYPES: dict[ExportFormat, str] = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+class ExportParams(BaseModel):
+    format: ExportFormat = Field(ExportFormat.NDJSON)
+
+
+def get_exporting(exporting: Annotated[ExportParams, Query()]) -> ExportParams:
+    return exporting
+
+
+async def encode_export(
+    schema: type[BaseSchema],
+    partitions: AsyncIterator[Sequence[Any]],
+    export_format: ExportFormat,
+) -> AsyncIterator[bytes]:
+    """
+    Encode the rows as they are fetched, one chunk per partition, so that the memory used does not depend
+    on the number of rows.
+    :param schema: the schema of the rows, defining the exported fields
+    :param partitions: the rows, in partitions
+    :param export_format:
+    :return: the encoded chunks
+    """
+    if export_format == ExportFormat.CSV:
+        columns = [field.alias or name for name, field in schema.model_fields.items()]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue().encode()
+
+        async for partition in partitions:
+            buffer.seek(0)
+            buffer.truncate()
+            for row in partition:
+                data = schema.model_validate(row).model_dump(mode="json", by_alias=True)
+                writer.writerow([data[column] for column in columns])
+            yield buffer.getvalue().encode()
+    else:
+        async for partition in partitions:
+            yield b"".join(
+                orjson.dumps(schema.model_validate(row).model_dump(by_alias=True))
+                + b"\n"
+                for row in partition
+            )
@@ -0,0 +1,19 @@
+from typing import Annotated
+
+from fastapi import Query
+from pydantic import BaseModel, Field
+
+
+class FieldsetParams(BaseModel):
+    fields: str | None = Field(None)
+    """Comma separated fields of the response (sparse fieldset), all of them if not specified"""
+
+    @property
+    def names(self) -> list[str] | None:
+        if self.fields is None:
+            return None
+        return [name.strip() for name in self.fields.split(",") if name.strip()]
+
+
+def get_fieldset(fieldset: Annotated[FieldsetParams, Query()]) -> FieldsetParams:
+    return fieldset
@@ -1,17 +1,51 @@
-from typing import Annotated
+from typing import Annotated, Any
 
 from fastapi import Query
-from pydantic import BaseModel, Field, AliasChoices, Json
+from pydantic import (
+    BaseModel,
+    Field,
+    AliasChoices,
+    Json,
+    BeforeValidator,
+    AfterValidator,
+)
 
 from system.query_builder import (
     WhereRule,
+    QueryBuilderLimitError,
+    check_where_rule_limits,
 )
+from system.settings import get_query_builder_settings
+
+
+def _check_where_length(value: Any) -> Any:
+    max_length = get_query_builder_settings().max_where_length
+    if isinstance(value, str) and len(value) > max_length:
+        raise ValueError(f"Longer than the maximum of {max_length} characters")
+    return value
+
+
+def _check_where_limits(where: WhereRule) -> WhereRule:
+    settings = get_query_builder_settings()
+    try:
+        check_where_rule_limits(
+            where, settings.max_depth, settings.max_rules, settings.max_list_values
+        )
+    except QueryBuilderLimitError as e:
+        raise ValueError(str(e)) from e
+    return where
 
 
 class FilteringParams(BaseModel):
-    where: Json[WhereRule] | None = Field(
-        None, validation_alias=AliasChoices("where", "filters")
-    )
+    # The limits are checked while parsing, before the rules reach the query builder
+    where: (
+        Annotated[
+            Json[WhereRule],
+            BeforeValidator(_check_where_length),
+            AfterValidator(_check_where_limits),
+        ]
+        | None
+    ) = Field(None, validation_alias=AliasChoices("where", "filters"))
 
 
 def get_filtering(filtering: Annotated[FilteringParams, Query()]) -> FilteringParams:
@@ -1,9 +1,39 @@
+import base64
+from typing import Any
+
+import orjson
 from pydantic import Field, AliasChoices, create_model, BaseModel, AliasPath
 
 
 class PaginationParams(BaseModel):
     skip: int
     limit: int
+    after: str | None = None
+    """Opaque cursor of the last row of the previous page (keyset pagination)"""
+    before: str | None = None
+    """Opaque cursor of the first row of the next page (keyset pagination)"""
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """
+    Encode the sort key values of a row into an opaque, URL-safe cursor.
+    :param values:
+    :return:
+    """
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    """
+    Decode a cursor built by encode_cursor.
+    :param cursor:
+    :return: the sort key values of the row
+    :raises ValueError: if the cursor is malformed
+    """
+    values = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
 
 
 _pagination_models_cache: dict[str, type[BaseModel]] = {}
@@ -50,7 +80,11 @@ def get_pagination(
     limit = _build_limit_field(default_limit, max_limit, AliasChoices("limit", "take"))
 
     model = create_model(
-        "DynamicPaginationParams", skip=(int, skip), limit=(int, limit)
+        "DynamicPaginationParams",
+        skip=(int, skip),
+        limit=(int, limit),
+        after=(str | None, None),
+        before=(str | None, None),
     )
 
     _pagination_models_cache[key] = model
@@ -0,0 +1,40 @@
+from typing import Any, Mapping
+
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+
+class SchemaResponse(Response):
+    """
+    JSON response serializing a schema in a single pass, straight to bytes by pydantic-core.
+    Returning it from an endpoint skips the validation and the serialization of the response model by FastAPI
+    (the response_model of the route is still used for the documentation), so the content must be trusted.
+    """
+
+    media_type = "application/json"
+
+    exclude_none: bool
+    include: Any
+
+    def __init__(
+        self,
+        content: BaseModel,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        background: BackgroundTask | None = None,
+        exclude_none: bool = False,
+        include: Any = None,
+    ):
+        # Set before the initialization, which renders the content
+        self.exclude_none = exclude_none
+        self.include = include
+        super().__init__(content, status_code, headers, background=background)
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.__pydantic_serializer__.to_json(
+            content,
+            by_alias=True,
+            exclude_none=self.exclude_none,
+            include=self.include,
+        )
@@ -1,22 +1,26 @@
-import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, status, Response
+from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from h11 import LocalProtocolError
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import ClientDisconnect
 
+from app.api.controllers.metrics_controller import metrics_router
 from app.api.routes import api_router
 from app.api.schema.shared.errors import (
     ApiError,
     handle_request_validation_error,
     handle_api_error,
 )
-from system.logging.setup import init_logging
-from system.redis.connection import build_redis_connection
+from system.authentication.password_hasher import shutdown_password_hasher
+from system.database.session import dispose_database_engines
+from system.logging.setup import init_logging, shutdown_logging
+from system.metrics.aggregation import start_metrics_publisher, stop_metrics_publisher
+from system.middleware.profiling import ProfilingMiddleware
+from system.middleware.request_context import RequestContextMiddleware
+from system.redis.connection import (
+    open_redis_connection_pool,
+    close_redis_connection_pool,
+)
 from system.settings import get_settings
-from system.uuids import generate_uuid
 
 
 @asynccontextmanager
@@ -26,8 +30,15 @@ async def lifespan(_fastapi_app: FastAPI):
 
     logger.debug("Settings: %s", settings.model_dump_json(indent=2))
     logger.info("Starting %s", settings.app_name)
+    await open_redis_connection_pool(settings.redis)
+    start_metrics_publisher(settings.metrics)
     yield
     logger.info("Stopping %s", settings.app_name)
+    await stop_metrics_publisher()
+    await close_redis_connection_pool()
+    await dispose_database_engines()
+    shutdown_password_hasher()
+    shutdown_logging()
 
 
 fastapi_app = FastAPI(
@@ -35,6 +46,8 @@ fastapi_app = FastAPI(
     openapi_url=None,
 )
 fastapi_app.include_router(api_router)
+if get_settings().metrics.enabled:
+    fastapi_app.include_router(metrics_router)
 
 
 @fastapi_app.exception_handler(Exception)
@@ -48,60 +61,9 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     return handle_request_validation_error(request, exc)
 
 
-@fastapi_app.middleware("http")
-async def catch_cancelled_request(request: Request, call_next):
-    try:
-        return await call_next(request)
-    except (ClientDisconnect, LocalProtocolError):
-        return Response(status_code=status.HTTP_204_NO_CONTENT)
-
-
-class SuppressNoResponseReturnedMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        try:
-            return await call_next(request)
-        except RuntimeError as exc:
-            if str(exc) == "No response returned." and await request.is_disconnected():
-                request_logger = request.state.logger
-                request_logger.info("Request cancelled")
-                return Response(status_code=status.HTTP_204_NO_CONTENT)
-            raise
-
-
+# The last middleware added is the outermost, the profiling runs inside the request context
+if get_settings().profiling.enabled:
+    # noinspection PyTypeChecker
+    fastapi_app.add_middleware(ProfilingMiddleware, settings=get_settings().profiling)
 # noinspection PyTypeChecker
-fastapi_app.add_middleware(SuppressNoResponseReturnedMiddleware)
-
-
-@fastapi_app.middleware("http")
-async def log_request(request: Request, call_next):
-    request_logger = request.state.request_logger
-    request_logger.info(f"Request: {request.method} {request.url}")
-    response = await call_next(request)
-    request_logger.info(f"Response: {response.status_code}")
-    return response
-
-
-@fastapi_app.middleware("http")
-async def set_request_logger(request: Request, call_next):
-    request_id = request.state.request_id
-    request_logger = logging.getLogger(request_id)
-    request.state.request_logger = request_logger
-    response = await call_next(request)
-    return response
-
-
-@fastapi_app.middleware("http")
-async def set_request_id(request: Request, call_next):
-    request_id = generate_uuid("REQ")
-    request.state.request_id = request_id
-    response = await call_next(request)
-    response.headers["X-Request-ID"] = request.state.request_id
-    return response
-
-
-@fastapi_app.middleware("http")
-async def remove_content_type_on_204(request: Request, call_next):
-    response = await call_next(request)
-    if response.status_code == status.HTTP_204_NO_CONTENT:
-        del response.headers["content-type"]
-    return response
+fastapi_app.add_middleware(RequestContextMiddleware)
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+import nacl.exceptions
+import nacl.pwhash
+from fastapi import Depends
+
+from system.authentication.settings import PasswordHashingSettings
+from system.settings import get_password_hashing_settings
+
+_T = TypeVar("_T")
+
+
+class PasswordHasherBusyError(Exception):
+    def __init__(self):
+        super().__init__("Too many password hashing requests")
+
+
+# Argon2 is run by libsodium, which releases the GIL, so threads are enough to run it in parallel
+_executor: ThreadPoolExecutor | None = None
+_pending_jobs = 0
+_pending_jobs_lock = threading.Lock()
+
+
+def _get_executor(settings: PasswordHashingSettings) -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.max_workers,
+            thread_name_prefix="password_hasher",
+        )
+    return _executor
+
+
+def shutdown_password_hasher() -> None:
+    """
+    Stop the password hashing threads, to be called on application shutdown.
+    :return:
+    """
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def _release_pending_job(_future: Future | None = None) -> None:
+    global _pending_jobs
+
+    with _pending_jobs_lock:
+        _pending_jobs -= 1
+
+
+def _verify(password_hash: bytes, password: bytes) -> bool:
+    try:
+        return nacl.pwhash.verify(password_hash, password)
+    except nacl.exceptions.InvalidkeyError:
+        return False
+
+
+class PasswordHasher:
+    _settings: PasswordHashingSettings
+
+    def __init__(
+        self,
+        settings: PasswordHashingSettings = Depends(get_password_hashing_settings),
+    ):
+        self._settings = settings
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password with Argon2id, outside the event loop
+        :param password:
+        :return: the password hash, including its parameters
+        :raises PasswordHasherBusyError: if too many passwords are waiting to be hashed
+        """
+        password_hash = await self._run(nacl.pwhash.str, password.encode())
+        return password_hash.decode()
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        """
+        Hash several passwords, using at most max_workers threads at a time.
+        If a hash fails, the others are cancelled (the ones already running in a thread complete anyway).
+        :param passwords:
+        :return: the password hashes, in the same order
+        :raises PasswordHasherBusyError: if too many passwords are waiting to be hashed
+        """
+        semaphore = asyncio.Semaphore(self._settings.max_workers)
+
+        async def hash_password(password: str) -> str:
+            async with semaphore:
+                return await self.hash(password)
+
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                tasks = [
+                    task_group.create_task(hash_password(password))
+                    for password in passwords
+                ]
+        except ExceptionGroup as e:
+            # The first error is raised as is, as by hash, rather than wrapped in a group
+            raise e.exceptions[0] from None
+
+        return [task.result() for task in tasks]
+
+    async def verify(self, password_hash: str, password: str) -> bool:
+        """
+        Check a password against its hash, outside the event loop
+        :param password_hash:
+        :param password:
+        :return: whether the password matches
+        :raises PasswordHasherBusyError: if too many passwords are waiting to be hashed
+        """
+        return await self._run(_verify, password_hash.encode(), password.encode())
+
+    async def _run(self, function: Callable[..., _T], *args) -> _T:
+        global _pending_jobs
+
+        with _pending_jobs_lock:
+            if (
+                _pending_jobs
+                >= self._settings.max_workers + self._settings.max_queue_size
+            ):
+                raise PasswordHasherBusyError()
+            _pending_jobs += 1
+
+        try:
+            future = _get_executor(self._settings).submit(function, *args)
+        except BaseException:
+            _release_pending_job()
+            raise
+        # Released when the job ends in the executor, not when the caller stops waiting for it (e.g. cancelled):
+        # a job already running keeps its thread busy
+        future.add_done_callback(_release_pending_job)
+        return await asyncio.wrap_future(future)
@@ -9,7 +9,15 @@ class TokenSettings(BaseModel):
     payload_encryption: EncryptionSettings
 
 
+class PasswordHashingSettings(BaseModel):
+    max_workers: int = 4
+    """Passwords hashed in parallel"""
+    max_queue_size: int = 16
+    """Passwords waiting to be hashed, before rejecting the requests"""
+
+
 class AuthSettings(BaseModel):
     jwt_algorithm: str
     access_token: TokenSettings
     refresh_token: TokenSettings
+    password_hashing: PasswordHashingSettings = PasswordHashingSettings()
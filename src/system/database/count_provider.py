@@ -0,0 +1,171 @@
+import asyncio
+import logging
+from enum import Enum
+from typing import Any, Sequence
+
+from fastapi import Depends
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import Select, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from system.redis.connection import get_redis_connection
+from system.redis.settings import RedisSettings
+from system.settings import get_redis_settings
+
+_logger = logging.getLogger(__name__)
+
+
+class CountMode(str, Enum):
+    EXACT = "exact"
+    """Count the rows"""
+    CACHED = "cached"
+    """Count the rows, reusing the count of the same query for a short time"""
+    ESTIMATE = "estimate"
+    """Use the row estimate of the query planner"""
+    WINDOW = "window"
+    """Count the rows in the page query itself, with count(*) OVER ()"""
+    NONE = "none"
+    """Do not count the rows"""
+
+
+class _Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element: _Explain, compiler, **kwargs) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kwargs)
+
+
+class CountProvider:
+    _redis: Redis
+    _settings: RedisSettings
+
+    def __init__(
+        self,
+        redis: Redis = Depends(get_redis_connection),
+        settings: RedisSettings = Depends(get_redis_settings),
+    ):
+        self._redis = redis
+        self._settings = settings
+
+    async def fetch_with_count(
+        self,
+        session: AsyncSession,
+        page_query: Select,
+        count_query: Select,
+        mode: CountMode,
+        cache_key: str | None = None,
+    ) -> tuple[Sequence[Any], int | None]:
+        """
+        Fetch the rows of a page and count the rows of the whole query.
+        The two queries run concurrently, the count on a separate pooled connection.
+        With CountMode.WINDOW a single query is run instead, counting every row matching its where clause,
+        so it should not be used when the page query has conditions that the count query does not have.
+        :param session: the database session
+        :param page_query: the query of the page
+        :param count_query: the filtered query, without pagination
+        :param mode: how to count the rows
+        :param cache_key: identifies the query (including its parameters) in the cache, required by CountMode.CACHED
+        :return: the rows of the page and the number of rows
+        """
+        if mode == CountMode.WINDOW:
+            return await self._fetch_with_window_count(session, page_query, count_query)
+        if mode == CountMode.NONE:
+            return (await session.exec(page_query)).all(), None
+
+        async def count() -> int | None:
+            async with AsyncSession(
+                session.bind, expire_on_commit=False
+            ) as count_session:
+                return await self.count(count_session, count_query, mode, cache_key)
+
+        async with asyncio.TaskGroup() as task_group:
+            rows_task = task_group.create_task(session.exec(page_query))
+            count_task = task_group.create_task(count())
+        return rows_task.result().all(), count_task.result()
+
+    async def _fetch_with_window_count(
+        self,
+        session: AsyncSession,
+        page_query: Select,
+        count_query: Select,
+    ) -> tuple[Sequence[Any], int | None]:
+        # Executed on the connection, since the ORM session would only return the entities of the query
+        connection = await session.connection()
+        rows = (
+            await connection.execute(
+                page_query.add_columns(func.count().over().label("total_count"))
+            )
+        ).all()
+        if rows:
+            return rows, rows[0].total_count
+
+        # An empty page does not tell whether it is past the last row, so the rows are counted
+        return rows, await self._count(session, count_query)
+
+    async def count(
+        self,
+        session: AsyncSession,
+        query: Select,
+        mode: CountMode,
+        cache_key: str | None = None,
+    ) -> int | None:
+        """
+        Count the rows returned by a query
+        :param session: the database session
+        :param query: the filtered query, without pagination
+        :param mode: how to count the rows
+        :param cache_key: identifies the query (including its parameters) in the cache, required by CountMode.CACHED
+        :return: the number of rows, None with CountMode.NONE
+        """
+        if mode == CountMode.NONE:
+            return None
+        if mode == CountMode.ESTIMATE:
+            return await self._estimate(session, query)
+        if mode == CountMode.CACHED and cache_key is not None:
+            return await self._count_cached(session, query, cache_key)
+        return await self._count(session, query)
+
+    @staticmethod
+    async def _count(session: AsyncSession, query: Select) -> int:
+        count_query = (
+            select(func.count())
+            .select_from(query.order_by(None).subquery())
+            .execution_options(**query.get_execution_options())
+        )
+        return (await session.exec(count_query)).one()
+
+    @staticmethod
+    async def _estimate(session: AsyncSession, query: Select) -> int:
+        explain = _Explain(query.order_by(None)).execution_options(
+            **query.get_execution_options()
+        )
+        plans = (await session.exec(explain)).scalar_one()
+        return int(plans[0]["Plan"]["Plan Rows"])
+
+    async def _count_cached(
+        self, session: AsyncSession, query: Select, cache_key: str
+    ) -> int:
+        key = f"count:{cache_key}"
+        try:
+            cached_count = await self._redis.get(key)
+        except RedisError as e:
+            _logger.warning("Count cache unavailable: %s", e)
+            return await self._count(session, query)
+        if cached_count is not None:
+            return int(cached_count)
+
+        count = await self._count(session, query)
+        try:
+            await self._redis.set(key, count, ex=self._settings.count_cache_ttl_seconds)
+        except RedisError as e:
+            _logger.warning("Count cache unavailable: %s", e)
+        return count
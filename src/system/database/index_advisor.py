@@ -0,0 +1,279 @@
+import argparse
+import re
+from dataclasses import dataclass
+from enum import Enum
+
+import httpx
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from alembic.util import rev_id
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql
+
+from system.database.operator_usage import OPERATOR_USAGE_METRIC
+from system.database.session import get_database_engine
+from system.database.settings import DatabaseId
+
+# Suggests the indexes for the filters and sorts that the clients use, from the operator usage
+# recorded by the query builder (see operator_usage), and writes them in an alembic migration.
+# The indexes are created concurrently, so that the migration does not lock the tables.
+#
+# Run from the root folder, with src in the PYTHONPATH, against a server with the metrics enabled:
+#   python -m system.database.index_advisor --metrics-url http://localhost:9191/metrics --metrics-token <token> --min-count 100
+
+
+class IndexKind(str, Enum):
+    TRIGRAM = "trgm"
+    """GIN index of the trigrams, for LIKE and ILIKE patterns, including the leading wildcards"""
+    LOWER = "lower"
+    """B-tree index on lower(column), for the case-insensitive equality"""
+    BTREE = "btree"
+    """B-tree index on the column, for equality, ranges and sorting"""
+
+
+_INDEX_KINDS: dict[str, IndexKind] = {
+    "like": IndexKind.TRIGRAM,
+    "ilike": IndexKind.TRIGRAM,
+    "contains": IndexKind.TRIGRAM,
+    "icontains": IndexKind.TRIGRAM,
+    "startswith": IndexKind.TRIGRAM,
+    "istartswith": IndexKind.TRIGRAM,
+    "endswith": IndexKind.TRIGRAM,
+    "iendswith": IndexKind.TRIGRAM,
+    "iequal": IndexKind.LOWER,
+    "equal": IndexKind.BTREE,
+    "in": IndexKind.BTREE,
+    "greaterthan": IndexKind.BTREE,
+    "greaterthanorequal": IndexKind.BTREE,
+    "lessthan": IndexKind.BTREE,
+    "lessthanorequal": IndexKind.BTREE,
+    "sort": IndexKind.BTREE,
+}
+"""Index serving each operator, the others (negations, null and empty checks) are not worth an index"""
+
+_preparer = postgresql.dialect().identifier_preparer
+
+_SAMPLE_PATTERN = re.compile(rf"^{OPERATOR_USAGE_METRIC}\{{(.*)\}} (\S+)$")
+_LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+@dataclass
+class IndexSuggestion:
+    table: str
+    """Table name, qualified by the schema"""
+    column: str
+    kind: IndexKind
+    usage_count: float
+
+    @property
+    def schema_name(self) -> str | None:
+        schema, _, _ = self.table.rpartition(".")
+        return schema or None
+
+    @property
+    def table_name(self) -> str:
+        return self.table.rpartition(".")[2]
+
+    @property
+    def name(self) -> str:
+        if self.kind == IndexKind.BTREE:
+            return f"ix_{self.table_name}_{self.column}"
+        return f"ix_{self.table_name}_{self.column}_{self.kind.value}"
+
+    def create_sql(self) -> str:
+        table = _preparer.quote(self.table_name)
+        if self.schema_name:
+            table = f"{_preparer.quote_schema(self.schema_name)}.{table}"
+        column = _preparer.quote(self.column)
+
+        if self.kind == IndexKind.TRIGRAM:
+            definition = f"USING gin ({column} gin_trgm_ops)"
+        elif self.kind == IndexKind.LOWER:
+            definition = f"(lower({column}))"
+        else:
+            definition = f"({column})"
+        return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON {table} {definition}"
+
+    def drop_sql(self) -> str:
+        name = self.name
+        if self.schema_name:
+            name = f"{_preparer.quote_schema(self.schema_name)}.{name}"
+        return f"DROP INDEX CONCURRENTLY IF EXISTS {name}"
+
+
+def _unescape_label_value(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), value)
+
+
+def parse_operator_usage(metrics_text: str) -> dict[tuple[str, str, str], float]:
+    """
+    Read the operator usage from the metrics in the Prometheus text format.
+    :param metrics_text: the content of the metrics endpoint
+    :return: the usage count by table, column and operator
+    """
+    usage = {}
+    for line in metrics_text.splitlines():
+        match = _SAMPLE_PATTERN.match(line)
+        if match is None:
+            continue
+        labels = {
+            name: _unescape_label_value(value)
+            for name, value in _LABEL_PATTERN.findall(match.group(1))
+        }
+        key = (labels["table"], labels["column"], labels["operator"])
+        usage[key] = usage.get(key, 0) + float(match.group(2))
+    return usage
+
+
+def suggest_indexes(
+    usage: dict[tuple[str, str, str], float], min_count: float
+) -> list[IndexSuggestion]:
+    """
+    Suggest an index for each column and kind of index used at least min_count times.
+    :param usage: the usage count by table, column and operator
+    :param min_count:
+    :return: the suggestions, the most used first
+    """
+    counts: dict[tuple[str, str, IndexKind], float] = {}
+    for (table, column, operator), count in usage.items():
+        kind = _INDEX_KINDS.get(operator)
+        if kind is not None:
+            counts[(table, column, kind)] = counts.get((table, column, kind), 0) + count
+
+    suggestions = [
+        IndexSuggestion(table, column, kind, count)
+        for (table, column, kind), count in counts.items()
+        if count >= min_count
+    ]
+    return sorted(suggestions, key=lambda s: s.usage_count, reverse=True)
+
+
+def _is_indexed(suggestion: IndexSuggestion, inspector) -> bool:
+    indexes = inspector.get_indexes(
+        suggestion.table_name, schema=suggestion.schema_name
+    )
+    if any(index["name"] == suggestion.name for index in indexes):
+        return True
+    if suggestion.kind != IndexKind.BTREE:
+        return False
+
+    # A b-tree index (or the primary key) starting with the column serves it as well
+    primary_key = inspector.get_pk_constraint(
+        suggestion.table_name, schema=suggestion.schema_name
+    )
+    leading_columns = [primary_key["constrained_columns"][:1]] + [
+        index["column_names"][:1] for index in indexes
+    ]
+    return [suggestion.column] in leading_columns
+
+
+def filter_existing_indexes(
+    suggestions: list[IndexSuggestion], database_id: DatabaseId
+) -> list[IndexSuggestion]:
+    """
+    Remove the suggestions already served by an index of the database.
+    """
+    with get_database_engine(database_id).connect() as connection:
+        inspector = inspect(connection)
+        return [s for s in suggestions if not _is_indexed(s, inspector)]
+
+
+def _render_statements(statements: list[str]) -> str:
+    lines = [
+        "# CREATE/DROP INDEX CONCURRENTLY cannot run in a transaction",
+        "with op.get_context().autocommit_block():",
+    ]
+    for statement in statements:
+        lines += [
+            "    op.execute(",
+            '        """',
+            f"        {statement};",
+            '        """',
+            "    )",
+        ]
+    # The template indents the first line only
+    return "\n    ".join(lines)
+
+
+def write_migration(
+    suggestions: list[IndexSuggestion], config_path: str, config_section: str
+) -> str:
+    """
+    Write an alembic migration creating the suggested indexes, after the current head.
+    :param suggestions:
+    :param config_path: the alembic configuration file
+    :param config_section: the section of the database in the configuration file
+    :return: the path of the migration
+    """
+    upgrades = [s.create_sql() for s in suggestions]
+    if any(s.kind == IndexKind.TRIGRAM for s in suggestions):
+        upgrades.insert(0, "CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    downgrades = [s.drop_sql() for s in reversed(suggestions)]
+
+    script_directory = ScriptDirectory.from_config(
+        Config(config_path, ini_section=config_section)
+    )
+    script = script_directory.generate_revision(
+        rev_id(),
+        "query_builder_indexes",
+        head="head",
+        upgrades=_render_statements(upgrades),
+        downgrades=_render_statements(downgrades),
+    )
+    return script.path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--metrics-url",
+        default="http://localhost:9191/metrics",
+        help="metrics endpoint of the server, summing the workers when the aggregation is enabled",
+    )
+    parser.add_argument(
+        "--metrics-token",
+        required=True,
+        help="bearer token of the metrics endpoint (metrics.token in the settings)",
+    )
+    parser.add_argument(
+        "--min-count",
+        type=float,
+        default=100,
+        help="usages of a column from which an index is suggested",
+    )
+    parser.add_argument("--config", default="alembic.ini")
+    parser.add_argument(
+        "--config-section",
+        default="main",
+        help="section of the main database in the alembic configuration",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print the suggestions without writing the migration",
+    )
+    args = parser.parse_args()
+
+    response = httpx.get(
+        args.metrics_url, headers={"Authorization": f"Bearer {args.metrics_token}"}
+    )
+    response.raise_for_status()
+    suggestions = filter_existing_indexes(
+        suggest_indexes(parse_operator_usage(response.text), args.min_count),
+        DatabaseId.MAIN,
+    )
+
+    if not suggestions:
+        print("No indexes to suggest")
+        return
+    for suggestion in suggestions:
+        print(f"{suggestion.usage_count:>12.0f}  {suggestion.create_sql()}")
+
+    if not args.dry_run:
+        print(
+            f"Migration written to {write_migration(suggestions, args.config, args.config_section)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
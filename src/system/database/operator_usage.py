@@ -0,0 +1,36 @@
+from sqlalchemy import Column
+
+from system.metrics.registry import metrics_registry
+from system.query_builder import Field, WhereRule, OrderByRule
+
+OPERATOR_USAGE_METRIC = "query_builder_operator_usage_total"
+
+_operator_usage = metrics_registry.counter(
+    OPERATOR_USAGE_METRIC,
+    "Operators of the query builder rules in the built queries, by column",
+    ("table", "column", "operator"),
+)
+
+
+def record_operator_usage(
+    fields: dict[str, Field],
+    where: WhereRule | None = None,
+    order_by: list[OrderByRule] | None = None,
+) -> None:
+    """
+    Count the operators applied to the columns by the rules of a query (see the index advisor).
+    The fields that are not a column of a table (e.g. expressions) are skipped.
+    :param fields: the query builder fields, by name
+    :param where:
+    :param order_by:
+    :return:
+    """
+    rules = ([where] if where else []) + (order_by or [])
+    for rule in rules:
+        for field_name, operator in rule.field_operators():
+            field = fields.get(field_name)
+            if field is None:
+                continue
+            column = getattr(field.database_column, "expression", None)
+            if isinstance(column, Column) and column.table is not None:
+                _operator_usage.inc((column.table.fullname, column.name, operator))
@@ -0,0 +1,96 @@
+import logging
+import time
+from typing import Any
+
+from sqlalchemy import Engine, event
+
+from system.logging.request_context import get_request_context
+from system.metrics.registry import metrics_registry
+from system.settings import get_metrics_settings
+
+_logger = logging.getLogger(__name__)
+
+_query_duration = metrics_registry.histogram(
+    "db_query_duration_seconds",
+    "Duration of the SQL statements",
+    ("database",),
+    get_metrics_settings().latency_buckets_seconds,
+)
+
+QUERY_FINGERPRINT_OPTION = "query_fingerprint"
+"""Execution option identifying the shape of a query (e.g. the query builder rules), reported in the slow query log"""
+
+
+def _redact_parameters(parameters: Any) -> Any:
+    """
+    Replace the values of the bound parameters with their type, so that no data ends up in the logs.
+    :param parameters: parameters of a statement, or list of parameters of an executemany
+    :return:
+    """
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"<{len(parameters)} parameter sets>"
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def instrument_engine(
+    engine: Engine, database_name: str, slow_query_threshold_ms: float
+) -> None:
+    """
+    Time the statements executed by an engine (for an async engine, its sync_engine):
+    - records them in the db_query_duration_seconds metric
+    - adds them to the context of the current request, reported in the Server-Timing header
+    - logs the statements slower than the threshold, with the query fingerprint and the redacted parameters
+    :param engine:
+    :param database_name: value of the database label of the metric
+    :param slow_query_threshold_ms: duration from which a statement is logged
+    :return:
+    """
+
+    # pylint: disable=unused-argument,too-many-arguments,too-many-positional-arguments
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        # Kept on the statement (or on the connection, for the statements without a context),
+        # overwritten by the next one: after_cursor_execute is not called for the failed statements
+        if context is not None:
+            context.query_start_time = time.perf_counter()
+        else:
+            connection.info["query_start_time"] = time.perf_counter()
+
+    # pylint: disable=unused-argument,too-many-arguments,too-many-positional-arguments
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        start_time = (
+            context.query_start_time
+            if context is not None
+            else connection.info["query_start_time"]
+        )
+        duration = time.perf_counter() - start_time
+        duration_ms = duration * 1000
+
+        _query_duration.observe((database_name,), duration)
+
+        request_context = get_request_context()
+        if request_context is not None:
+            request_context.add_query(duration_ms)
+
+        if duration_ms >= slow_query_threshold_ms:
+            fingerprint = (
+                context.execution_options.get(QUERY_FINGERPRINT_OPTION)
+                if context is not None
+                else None
+            )
+            _logger.warning(
+                "Slow query (%.1f ms, fingerprint %s): %s; parameters: %s",
+                duration_ms,
+                fingerprint,
+                statement,
+                _redact_parameters(parameters),
+            )
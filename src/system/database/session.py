@@ -1,11 +1,17 @@
-from sqlalchemy import Engine, URL
+import time
+
+from sqlalchemy import Engine, URL, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from system.database.query_timing import instrument_engine
 from system.database.settings import (
     DatabaseId,
     DatabaseSettings,
 )
-from system.settings import get_database_settings, get_settings
+from system.metrics.registry import metrics_registry
+from system.settings import get_database_settings, get_settings, get_metrics_settings
 
 _settings = get_settings()
 
@@ -21,6 +27,35 @@ _main_database_connection_string = URL.create(
 )
 
 
+_pool_checkout_duration = metrics_registry.histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time spent getting a connection from the database pool",
+    ("database",),
+    get_metrics_settings().latency_buckets_seconds,
+)
+_pool_connections = metrics_registry.gauge(
+    "db_pool_connections",
+    "Connections of the database pool",
+    ("database", "state"),
+)
+
+
+class _TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Connection pool recording the checkout time, including the wait for a free connection
+    and the opening of new connections.
+    """
+
+    def _do_get(self):
+        start_time = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _pool_checkout_duration.observe(
+                (self.logging_name,), time.perf_counter() - start_time
+            )
+
+
 _database_engines: dict[DatabaseId, Engine] = {
     DatabaseId.MAIN: create_engine(
         _main_database_connection_string,
@@ -30,11 +65,68 @@ _database_engines: dict[DatabaseId, Engine] = {
     ),
 }
 
+# psycopg 3 serves both the sync and the asyncio dialect from the same URL,
+# so the async engines share the connection settings of the sync ones.
+_async_database_engines: dict[DatabaseId, AsyncEngine] = {
+    DatabaseId.MAIN: create_async_engine(
+        _main_database_connection_string,
+        logging_name=DatabaseId.MAIN,
+        poolclass=_TimedAsyncAdaptedQueuePool,
+        pool_logging_name=DatabaseId.MAIN.value,
+        pool_size=_main_database_settings.pool_size,
+        pool_pre_ping=True,
+    ),
+}
+
+# Engines sharing the pools of the async engines, whose connections open read-only transactions
+# (the read-only flag is reset when the connections are returned to the pool)
+_read_only_async_database_engines: dict[DatabaseId, AsyncEngine] = {
+    database_id: async_engine.execution_options(postgresql_readonly=True)
+    for database_id, async_engine in _async_database_engines.items()
+}
+
+
+instrument_engine(
+    _database_engines[DatabaseId.MAIN],
+    DatabaseId.MAIN.value,
+    _main_database_settings.slow_query_threshold_ms,
+)
+instrument_engine(
+    _async_database_engines[DatabaseId.MAIN].sync_engine,
+    DatabaseId.MAIN.value,
+    _main_database_settings.slow_query_threshold_ms,
+)
+
+
+def _collect_pool_metrics() -> None:
+    for database_id, async_engine in _async_database_engines.items():
+        pool = async_engine.pool
+        _pool_connections.set((database_id.value, "checked_out"), pool.checkedout())
+        _pool_connections.set((database_id.value, "checked_in"), pool.checkedin())
+        _pool_connections.set((database_id.value, "overflow"), max(pool.overflow(), 0))
+
+
+metrics_registry.add_collector(_collect_pool_metrics)
+
 
 def get_database_engine(database_id: DatabaseId) -> Engine:
     return _database_engines[database_id]
 
 
+def get_async_database_engine(database_id: DatabaseId) -> AsyncEngine:
+    return _async_database_engines[database_id]
+
+
+async def dispose_database_engines() -> None:
+    """
+    Close all the pooled connections, to be called on application shutdown.
+    """
+    for async_engine in _async_database_engines.values():
+        await async_engine.dispose()
+    for engine in _database_engines.values():
+        engine.dispose()
+
+
 class DatabaseSession:
     database_id: DatabaseId
 
@@ -55,3 +147,50 @@ class DatabaseSession:
     def get(database_id: DatabaseId) -> Session:
         engine = _database_engines[database_id]
         return Session(engine)
+
+
+class AsyncDatabaseSession:
+    database_id: DatabaseId
+    read_only: bool
+
+    def __init__(self, database_id: DatabaseId, read_only: bool = False):
+        """
+        :param database_id:
+        :param read_only: the session only reads, see get
+        """
+        self.database_id = database_id
+        self.read_only = read_only
+
+    async def __call__(self) -> AsyncSession:
+        async with self.get(self.database_id, self.read_only) as database_session:
+            if self.read_only:
+                # Nothing to commit, the transaction is rolled back when the session is closed
+                yield database_session
+                return
+
+            try:
+                yield database_session
+                await database_session.commit()
+            except Exception as e:
+                await database_session.rollback()
+                raise e
+
+    @staticmethod
+    def get(database_id: DatabaseId, read_only: bool = False) -> AsyncSession:
+        """
+        :param database_id:
+        :param read_only: the session never flushes and its transactions are read-only,
+            for the requests that only read (best with queries selecting columns instead of entities)
+        :return:
+        """
+        if read_only:
+            return AsyncSession(
+                _read_only_async_database_engines[database_id],
+                expire_on_commit=False,
+                autoflush=False,
+            )
+
+        engine = _async_database_engines[database_id]
+        # expire_on_commit is disabled, so that the entities can still be read
+        # after the commit without triggering an implicit (sync) refresh.
+        return AsyncSession(engine, expire_on_commit=False)
@@ -16,3 +16,5 @@ class DatabaseSettings(BaseModel):
     database: str | None
     pool_size: int
     query: dict
+    slow_query_threshold_ms: float = 500
+    """Duration from which the statements are logged"""
@@ -1,3 +1,4 @@
+import logging
 from logging import Logger
 
 from fastapi import Request
@@ -11,5 +12,37 @@ class RequestLog(BaseModel):
         return self.model_dump_json(indent=2)
 
 
+class LazyRequestLog:
+    """
+    Log message deferring the construction and the serialization of the RequestLog
+    until a handler formats the record.
+    """
+
+    __slots__ = ("input",)
+
+    input: dict
+
+    def __init__(self, input: dict):  # pylint: disable=redefined-builtin
+        self.input = input
+
+    def __str__(self):
+        return str(RequestLog(input=self.input))
+
+
+def log_request_input(
+    logger: Logger,
+    input: dict,  # pylint: disable=redefined-builtin
+    level: int = logging.DEBUG,
+) -> None:
+    """
+    Log the input of a request, doing no work when the level is not enabled for the logger.
+    :param logger: request logger
+    :param input: input of the request (e.g. query parameters, body)
+    :param level: logging level, DEBUG by default
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, LazyRequestLog(input))
+
+
 def get_request_logger(request: Request) -> Logger:
     return request.state.request_logger
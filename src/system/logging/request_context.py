@@ -0,0 +1,91 @@
+import logging
+import time
+from contextvars import ContextVar, Token
+
+from starlette.types import Scope
+
+
+class RequestContext:
+    """
+    Context of the HTTP request being handled, attached to the log records by RequestContextFilter.
+    """
+
+    __slots__ = (
+        "request_id",
+        "method",
+        "start_time",
+        "query_count",
+        "query_duration_ms",
+        "_scope",
+    )
+
+    request_id: str
+    method: str
+    start_time: float
+    query_count: int
+    query_duration_ms: float
+
+    _scope: Scope
+
+    def __init__(self, request_id: str, scope: Scope):
+        self.request_id = request_id
+        self.method = scope["method"]
+        self.start_time = time.perf_counter()
+        self.query_count = 0
+        self.query_duration_ms = 0.0
+        self._scope = scope
+
+    @property
+    def route(self) -> str | None:
+        """Path template of the matched route, available once the request is routed"""
+        route = self._scope.get("route")
+        return getattr(route, "path", None)
+
+    @property
+    def latency_ms(self) -> float:
+        return (time.perf_counter() - self.start_time) * 1000
+
+    def add_query(self, duration_ms: float) -> None:
+        """Account a SQL statement executed for the request"""
+        self.query_count += 1
+        self.query_duration_ms += duration_ms
+
+
+_request_context: ContextVar[RequestContext | None] = ContextVar(
+    "request_context", default=None
+)
+
+
+def get_request_context() -> RequestContext | None:
+    return _request_context.get()
+
+
+def set_request_context(request_context: RequestContext) -> Token:
+    return _request_context.set(request_context)
+
+
+def reset_request_context(token: Token) -> None:
+    _request_context.reset(token)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Add the request_id, route and latency_ms attributes of the current request to the log records
+    (None outside a request), so that they can be used by the formatters.
+    The attributes already set on the record (e.g. before being queued to the listener thread) are kept.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if hasattr(record, "request_id"):
+            return True
+
+        request_context = _request_context.get()
+        if request_context is None:
+            record.request_id = None
+            record.route = None
+            record.latency_ms = None
+        else:
+            record.request_id = request_context.request_id
+            record.route = request_context.route
+            record.latency_ms = round(request_context.latency_ms, 3)
+        return True
@@ -5,6 +5,20 @@ from pydantic import BaseModel
 
 class LoggingFormatter(Enum):
     PLAIN = "PLAIN"
+    JSON = "JSON"
+
+
+class LoggingQueueFullPolicy(Enum):
+    DROP = "DROP"
+    """Drop the record, counting it"""
+    BLOCK = "BLOCK"
+    """Wait for the queue to have room, stalling the caller"""
+
+
+class LoggingQueueSettings(BaseModel):
+    enabled: bool = True
+    max_size: int = 10_000
+    full_policy: LoggingQueueFullPolicy = LoggingQueueFullPolicy.DROP
 
 
 class LoggingSinkSettings(BaseModel):
@@ -20,7 +34,12 @@ class LoggingSinkFileSettings(LoggingSinkSettings):
 
 class LoggingSettings(BaseModel):
     root_level: str
-    format: str
+    format: str = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+    """
+    Format of the PLAIN formatter. The records of all the requests are logged by the "request" logger,
+    so %(name)s no longer identifies the request: use %(request_id)s (None outside a request).
+    """
     console: LoggingSinkSettings
     file: LoggingSinkFileSettings
     module_levels: dict[str, str]
+    queue: LoggingQueueSettings = LoggingQueueSettings()
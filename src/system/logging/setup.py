@@ -1,9 +1,18 @@
+import copy
 import datetime
 import logging
+import queue
 import sys
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 
-from system.logging.settings import LoggingFormatter
+import orjson
+
+from system.logging.settings import (
+    LoggingFormatter,
+    LoggingQueueFullPolicy,
+    LoggingQueueSettings,
+)
+from system.logging.request_context import RequestContextFilter
 from system.settings import get_logging_settings
 
 
@@ -21,19 +30,167 @@ def _formatTime(  # pylint: disable=invalid-name
     )
 
 
+class _JsonFormatter(logging.Formatter):
+    """
+    Format the records as single-line JSON objects, including the context of the request.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for attribute in ("request_id", "route", "latency_ms"):
+            value = getattr(record, attribute, None)
+            if value is not None:
+                data[attribute] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return orjson.dumps(data, default=str).decode()
+
+
+class _BoundedQueueHandler(QueueHandler):
+    """
+    Queue handler that applies the full policy of the settings
+    instead of reporting an error when the queue is full.
+    """
+
+    full_policy: LoggingQueueFullPolicy
+    dropped_records: int
+
+    def __init__(self, log_queue: queue.Queue, full_policy: LoggingQueueFullPolicy):
+        super().__init__(log_queue)
+        self.full_policy = full_policy
+        self.dropped_records = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the base implementation, the exception and the stack are not formatted into the message,
+        # so that the formatters of the sinks can write them (e.g. in the exception key of the JSON)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.full_policy == LoggingQueueFullPolicy.BLOCK:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped_records += 1
+
+
+_installed_handlers: list[logging.Handler] = []
+_queue_handler: _BoundedQueueHandler | None = None
+_queue_listener: QueueListener | None = None
+
+
+def _install_handlers(
+    logger: logging.Logger,
+    handlers: list[logging.Handler],
+    queue_settings: LoggingQueueSettings,
+) -> None:
+    global _queue_handler, _queue_listener
+
+    if not handlers:
+        return
+
+    # The request context is read from the task logging the record, so it is added before the queue
+    request_context_filter = RequestContextFilter()
+
+    if not queue_settings.enabled:
+        for handler in handlers:
+            handler.addFilter(request_context_filter)
+            logger.addHandler(handler)
+        _installed_handlers.extend(handlers)
+        return
+
+    # The records are written by the listener thread, so that logging never waits for the I/O
+    log_queue = queue.Queue(maxsize=queue_settings.max_size)
+    _queue_handler = _BoundedQueueHandler(log_queue, queue_settings.full_policy)
+    _queue_handler.addFilter(request_context_filter)
+    # The records that no sink writes are dropped before being prepared (formatting the message)
+    _queue_handler.setLevel(min(handler.level for handler in handlers))
+    _queue_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+
+    logger.addHandler(_queue_handler)
+    _installed_handlers.append(_queue_handler)
+
+
+def get_dropped_log_records() -> int:
+    """
+    Number of log records dropped because the logging queue was full.
+    :return:
+    """
+    return _queue_handler.dropped_records if _queue_handler else 0
+
+
+def shutdown_logging() -> None:
+    """
+    Write the queued records and remove the handlers installed by init_logging.
+    :return:
+    """
+    global _queue_handler, _queue_listener
+
+    logger = logging.getLogger()
+
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        if _queue_handler.dropped_records:
+            record = logger.makeRecord(
+                logger.name,
+                logging.WARNING,
+                __file__,
+                0,
+                "Dropped %d log records, the logging queue was full",
+                (_queue_handler.dropped_records,),
+                None,
+            )
+            # Handled directly by the sinks, so it gets the attributes of the formats from the filter here
+            RequestContextFilter().filter(record)
+            for handler in _queue_listener.handlers:
+                handler.handle(record)
+        for handler in _queue_listener.handlers:
+            handler.close()
+
+    for handler in _installed_handlers:
+        logger.removeHandler(handler)
+        handler.close()
+
+    _installed_handlers.clear()
+    _queue_handler = None
+    _queue_listener = None
+
+
 def init_logging() -> logging.Logger:
     settings = get_logging_settings()
 
+    # Initializing the logging again replaces the handlers, instead of adding more
+    shutdown_logging()
+
     logger = logging.getLogger()
     logger.setLevel(settings.root_level.upper())
 
     plain_formatter = logging.Formatter(fmt=settings.format)
     plain_formatter.formatTime = _formatTime
 
+    json_formatter = _JsonFormatter()
+    json_formatter.formatTime = _formatTime
+
     formatters = {
         LoggingFormatter.PLAIN: plain_formatter,
+        LoggingFormatter.JSON: json_formatter,
     }
 
+    handlers: list[logging.Handler] = []
+
     if settings.file.enabled:
         file_handler = TimedRotatingFileHandler(
             settings.file.path,
@@ -43,14 +200,16 @@ def init_logging() -> logging.Logger:
         file_handler.setLevel(settings.file.root_level.upper())
         formatter = formatters[settings.file.formatter]
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
 
     if settings.console.enabled:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(settings.console.root_level.upper())
         formatter = formatters[settings.console.formatter]
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
+
+    _install_handlers(logger, handlers, settings.queue)
 
     for module, level in settings.module_levels.items():
         logging.getLogger(module).setLevel(level.upper())
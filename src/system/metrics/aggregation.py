@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+import socket
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from system.metrics.registry import metrics_registry, merge_snapshots
+from system.metrics.settings import MetricsSettings
+from system.redis.connection import get_redis_connection
+
+_logger = logging.getLogger(__name__)
+
+_WORKERS_KEY = "metrics:workers"
+"""Set of the keys of the workers publishing their metrics"""
+_worker_key = f"metrics:worker:{socket.gethostname()}:{os.getpid()}"
+
+_publisher_task: asyncio.Task | None = None
+
+
+async def publish_metrics(redis: Redis, settings: MetricsSettings) -> None:
+    """
+    Store the snapshot of the metrics of this worker in Redis, expiring when the worker stops publishing.
+    :param redis:
+    :param settings:
+    :return:
+    """
+    async with redis.pipeline(transaction=False) as pipeline:
+        pipeline.set(
+            _worker_key,
+            orjson.dumps(metrics_registry.snapshot()),
+            ex=settings.worker_ttl_seconds,
+        )
+        pipeline.sadd(_WORKERS_KEY, _worker_key)
+        await pipeline.execute()
+
+
+async def collect_metrics(redis: Redis, settings: MetricsSettings) -> dict:
+    """
+    Snapshot of the metrics, summed over all the workers publishing to Redis when the aggregation is enabled.
+    Falls back to the metrics of this worker if Redis is not available.
+    :param redis:
+    :param settings:
+    :return:
+    """
+    if not settings.aggregation_enabled:
+        return metrics_registry.snapshot()
+
+    try:
+        await publish_metrics(redis, settings)
+        keys = list(await redis.smembers(_WORKERS_KEY))
+        values = await redis.mget(keys)
+        # The workers that stopped publishing without removing their metrics (e.g. killed)
+        expired_keys = [key for key, value in zip(keys, values) if value is None]
+        if expired_keys:
+            await redis.srem(_WORKERS_KEY, *expired_keys)
+    except RedisError as e:
+        _logger.warning("Cannot aggregate the metrics of the workers: %s", e)
+        return metrics_registry.snapshot()
+
+    return merge_snapshots([orjson.loads(v) for v in values if v is not None])
+
+
+async def _publish_periodically(settings: MetricsSettings) -> None:
+    redis = await get_redis_connection()
+    while True:
+        await asyncio.sleep(settings.publish_interval_seconds)
+        try:
+            await publish_metrics(redis, settings)
+        except RedisError as e:
+            _logger.warning("Cannot publish the metrics: %s", e)
+
+
+def start_metrics_publisher(settings: MetricsSettings) -> None:
+    """
+    Start publishing the metrics of this worker, to be called on application startup (after opening Redis).
+    :param settings:
+    :return:
+    """
+    global _publisher_task
+
+    if settings.enabled and settings.aggregation_enabled:
+        _publisher_task = asyncio.create_task(_publish_periodically(settings))
+
+
+async def stop_metrics_publisher() -> None:
+    """
+    Stop publishing the metrics and remove the ones of this worker, to be called on application shutdown.
+    :return:
+    """
+    global _publisher_task
+
+    if _publisher_task is None:
+        return
+
+    _publisher_task.cancel()
+    try:
+        await _publisher_task
+    except asyncio.CancelledError:
+        pass
+    _publisher_task = None
+
+    try:
+        redis = await get_redis_connection()
+        async with redis.pipeline(transaction=False) as pipeline:
+            pipeline.delete(_worker_key)
+            pipeline.srem(_WORKERS_KEY, _worker_key)
+            await pipeline.execute()
+    except RedisError as e:
+        _logger.warning("Cannot remove the metrics of the worker: %s", e)
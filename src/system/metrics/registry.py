@@ -0,0 +1,240 @@
+import bisect
+import math
+from typing import Any, Callable
+
+# Metrics are updated from the event loop thread only, so they need no locking.
+# The snapshots are JSON serializable, so that the metrics of the workers can be aggregated through Redis.
+
+_Labels = tuple[str, ...]
+
+
+class _Metric:
+    type: str
+    name: str
+    help: str
+    label_names: tuple[str, ...]
+
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = ()):
+        # pylint: disable=redefined-builtin
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values: dict[_Labels, Any] = {}
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.help,
+            "label_names": list(self.label_names),
+            "samples": [
+                [list(labels), value] for labels, value in self._values.items()
+            ],
+        }
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, labels: _Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, labels: _Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: _Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, labels: _Labels, value: float) -> None:
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+    buckets: list[float]
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: tuple[str, ...] = (),
+        buckets: list[float] | None = None,
+    ):
+        # pylint: disable=redefined-builtin
+        super().__init__(name, help, label_names)
+        self.buckets = sorted(buckets or [])
+
+    def observe(self, labels: _Labels, value: float) -> None:
+        """
+        Record an observation.
+        :param labels: values of the labels, in the order of label_names
+        :param value: observed value (e.g. latency in seconds)
+        """
+        sample = self._values.get(labels)
+        if sample is None:
+            # Per-bucket counts (the last one is +Inf), sum, count
+            sample = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        sample[0][bisect.bisect_left(self.buckets, value)] += 1
+        sample[1] += value
+        sample[2] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.help,
+            "label_names": list(self.label_names),
+            "buckets": list(self.buckets),
+            "samples": [
+                [list(labels), [list(counts), total, count]]
+                for labels, (counts, total, count) in self._values.items()
+            ],
+        }
+
+
+class MetricsRegistry:
+    """
+    Registry of the metrics of the process.
+    The collectors are called before each snapshot, to update the gauges read from other components
+    (e.g. the connection pools).
+    """
+
+    _metrics: dict[str, _Metric]
+    _collectors: list[Callable[[], None]]
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, help: str, label_names: tuple[str, ...] = ()
+    ) -> Counter:
+        # pylint: disable=redefined-builtin
+        return self._register(Counter(name, help, label_names))
+
+    def gauge(self, name: str, help: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        # pylint: disable=redefined-builtin
+        return self._register(Gauge(name, help, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        label_names: tuple[str, ...] = (),
+        buckets: list[float] | None = None,
+    ) -> Histogram:
+        # pylint: disable=redefined-builtin
+        return self._register(Histogram(name, help, label_names, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        for collector in self._collectors:
+            collector()
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+def merge_snapshots(snapshots: list[dict]) -> dict:
+    """
+    Sum the snapshots of several workers: counters, gauges and histogram buckets are added label by label.
+    :param snapshots: snapshots of the registries of the workers
+    :return: merged snapshot
+    """
+    merged: dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            merged_metric = merged.get(name)
+            if merged_metric is None:
+                merged_metric = merged[name] = metric | {"samples": {}}
+            elif merged_metric.get("buckets") != metric.get("buckets"):
+                # Workers running with different buckets cannot be added
+                continue
+
+            samples = merged_metric["samples"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = samples.get(key)
+                if current is None:
+                    samples[key] = value
+                elif metric["type"] == "histogram":
+                    samples[key] = [
+                        [a + b for a, b in zip(current[0], value[0])],
+                        current[1] + value[1],
+                        current[2] + value[2],
+                    ]
+                else:
+                    samples[key] = current + value
+
+    for metric in merged.values():
+        metric["samples"] = [
+            [list(labels), value] for labels, value in metric["samples"].items()
+        ]
+    return merged
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names: list[str], values: list[str], extra: str = "") -> str:
+    labels = [f'{n}="{_escape_label_value(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def render_text(snapshot: dict) -> str:
+    """
+    Render a snapshot in the Prometheus text exposition format (version 0.0.4).
+    :param snapshot: snapshot of a registry, or merged snapshots
+    :return:
+    """
+    lines = []
+    for name, metric in snapshot.items():
+        label_names = metric["label_names"]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+
+        for labels, value in metric["samples"]:
+            if metric["type"] != "histogram":
+                lines.append(
+                    f"{name}{_format_labels(label_names, labels)} {_format_number(value)}"
+                )
+                continue
+
+            bucket_counts, total, count = value
+            cumulative = 0
+            for upper_bound, bucket_count in zip(
+                metric["buckets"] + [math.inf], bucket_counts
+            ):
+                cumulative += bucket_count
+                le = f'le="{_format_number(upper_bound)}"'
+                lines.append(
+                    f"{name}_bucket{_format_labels(label_names, labels, le)} {cumulative}"
+                )
+            lines.append(
+                f"{name}_sum{_format_labels(label_names, labels)} {_format_number(total)}"
+            )
+            lines.append(f"{name}_count{_format_labels(label_names, labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
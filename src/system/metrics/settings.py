@@ -0,0 +1,31 @@
+from pydantic import BaseModel, SecretStr
+
+
+class MetricsSettings(BaseModel):
+    token: SecretStr | None = None
+    """Bearer token of the scrapers of /metrics, the metrics are not served if not set"""
+    latency_buckets_seconds: list[float] = [
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+    ]
+    """Upper bounds of the buckets of the latency histograms"""
+    server_timing_enabled: bool = True
+    """Report the time spent in the database and in total in the Server-Timing header of the responses"""
+    aggregation_enabled: bool = True
+    """Publish the metrics of each worker to Redis, so that /metrics returns the sum of all the workers"""
+    publish_interval_seconds: float = 5
+    worker_ttl_seconds: int = 30
+    """Time after which the metrics of a worker that stopped publishing are no longer aggregated"""
+
+    @property
+    def enabled(self) -> bool:
+        return self.token is not None
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import random
+import secrets
+import threading
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Scope, Receive, Send
+
+from system.profiling.sampler import StackSampler, format_collapsed_stacks
+from system.profiling.settings import ProfilingSettings
+
+_logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling the requests with the X-Profile header matching the profiling token,
+    or a random sample of the requests, and writing their collapsed stacks to {output_path}/{request_id}.collapsed.
+    Only one request is profiled at a time, since the samples include the whole event loop.
+    It must be added before RequestContextMiddleware, so that it runs inside the request context.
+    """
+
+    app: ASGIApp
+    settings: ProfilingSettings
+
+    _profiling: bool
+
+    def __init__(self, app: ASGIApp, settings: ProfilingSettings):
+        self.app = app
+        self.settings = settings
+        self._profiling = False
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if self._profiling:
+            return False
+
+        token = self.settings.token
+        profile_header = Headers(scope=scope).get("x-profile")
+        if token is not None and profile_header is not None:
+            return secrets.compare_digest(
+                profile_header.encode(), token.get_secret_value().encode()
+            )
+        return random.random() < self.settings.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._profiling = True
+        sampler = StackSampler(threading.get_ident(), self.settings.interval_seconds)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            samples = sampler.stop()
+            self._profiling = False
+
+            request_id = scope["state"]["request_id"]
+            output_file = Path(self.settings.output_path) / f"{request_id}.collapsed"
+            try:
+                await asyncio.to_thread(
+                    _write_profile, output_file, format_collapsed_stacks(samples)
+                )
+                _logger.info("Profile written to %s", output_file)
+            except OSError as e:
+                _logger.warning("Cannot write the profile: %s", e)
+
+
+def _write_profile(output_file: Path, content: str) -> None:
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    output_file.write_text(content)
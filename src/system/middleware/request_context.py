@@ -0,0 +1,137 @@
+import logging
+
+from fastapi import status
+from h11 import LocalProtocolError
+from starlette.datastructures import MutableHeaders, URL
+from starlette.requests import ClientDisconnect
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+
+from system.logging.request_context import (
+    RequestContext,
+    set_request_context,
+    reset_request_context,
+)
+from system.metrics.registry import metrics_registry
+from system.settings import get_metrics_settings
+from system.uuids import generate_uuid
+
+# A single logger for all the requests, the request id is added to the records by RequestContextFilter.
+# Creating a logger per request would keep every one of them in the logging manager forever.
+_request_logger = logging.getLogger("request")
+
+_metrics_settings = get_metrics_settings()
+
+_requests_total = metrics_registry.counter(
+    "http_requests_total",
+    "HTTP requests handled",
+    ("method", "route", "status"),
+)
+_request_duration = metrics_registry.histogram(
+    "http_request_duration_seconds",
+    "Duration of the HTTP requests, until the response is sent",
+    ("method", "route"),
+    _metrics_settings.latency_buckets_seconds,
+)
+_requests_in_flight = metrics_registry.gauge(
+    "http_requests_in_flight",
+    "HTTP requests being handled",
+    ("method",),
+)
+
+
+def _format_server_timing(request_context: RequestContext) -> str:
+    # The statements still running (e.g. of a streaming response) are not included
+    return (
+        f'db;dur={request_context.query_duration_ms:.1f};desc="{request_context.query_count} queries", '
+        f"total;dur={request_context.latency_ms:.1f}"
+    )
+
+
+class RequestContextMiddleware:
+    """
+    Pure ASGI middleware setting up the context of each HTTP request in a single pass:
+    - generates the request id, returned in the X-Request-ID header
+    - sets the request context attached to the log records
+      (and request.state.request_id and request.state.request_logger)
+    - logs the request and the response
+    - records the request metrics (count, duration and in-flight requests, by route template)
+    - reports the time spent in the database in the Server-Timing header
+    - answers 204 to the requests cancelled by the client
+    - removes the content type from the 204 responses
+
+    Unlike the middlewares based on BaseHTTPMiddleware, it does not wrap the response in a memory stream,
+    so it adds no per-request task and does not buffer streaming responses.
+    """
+
+    app: ASGIApp
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        request_id = generate_uuid("REQ")
+        request_context = RequestContext(request_id, scope)
+        request_context_token = set_request_context(request_context)
+        request_logger = _request_logger
+
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id
+        state["request_logger"] = request_logger
+
+        if request_logger.isEnabledFor(logging.INFO):
+            request_logger.info("Request: %s %s", method, URL(scope=scope))
+
+        response_started = False
+        # Unhandled exceptions are answered by the outer ServerErrorMiddleware
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        async def send_with_context(message: Message) -> None:
+            nonlocal response_started, status_code
+
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                if status_code == status.HTTP_204_NO_CONTENT:
+                    del headers["content-type"]
+                if _metrics_settings.server_timing_enabled:
+                    headers.append(
+                        "Server-Timing", _format_server_timing(request_context)
+                    )
+
+                request_logger.info(
+                    "Response: %s (%.1f ms)", status_code, request_context.latency_ms
+                )
+
+            await send(message)
+
+        _requests_in_flight.inc((method,))
+        try:
+            await self.app(scope, receive, send_with_context)
+        except (ClientDisconnect, LocalProtocolError):
+            request_logger.info("Request cancelled")
+            if not response_started:
+                await send_with_context(
+                    {
+                        "type": "http.response.start",
+                        "status": status.HTTP_204_NO_CONTENT,
+                        "headers": [],
+                    }
+                )
+                await send_with_context({"type": "http.response.body", "body": b""})
+        finally:
+            # The route template (not the path) keeps the cardinality of the metrics bounded
+            route = request_context.route or "unmatched"
+            _requests_in_flight.dec((method,))
+            _requests_total.inc((method, route, str(status_code)))
+            _request_duration.observe(
+                (method, route), request_context.latency_ms / 1000
+            )
+            reset_request_context(request_context_token)
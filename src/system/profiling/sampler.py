@@ -0,0 +1,71 @@
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+
+
+class StackSampler:
+    """
+    Sampling profiler of a thread: a background thread records the stack of the profiled thread at regular
+    intervals, so that the profiled code runs unchanged.
+    Profiling the event loop thread, the samples include all the tasks running meanwhile, and the time spent
+    waiting for I/O (e.g. the database) appears under the selector of the event loop.
+    """
+
+    _thread_id: int
+    _interval_seconds: float
+    _samples: Counter[str]
+    _stop_event: threading.Event
+    _sampling_thread: threading.Thread | None
+
+    def __init__(self, thread_id: int, interval_seconds: float):
+        self._thread_id = thread_id
+        self._interval_seconds = interval_seconds
+        self._samples = Counter()
+        self._stop_event = threading.Event()
+        self._sampling_thread = None
+
+    def start(self) -> None:
+        self._sampling_thread = threading.Thread(
+            target=self._sample, name="stack-sampler", daemon=True
+        )
+        self._sampling_thread.start()
+
+    def stop(self) -> Counter[str]:
+        """
+        Stop sampling.
+        :return: number of samples of each collapsed stack
+        """
+        self._stop_event.set()
+        if self._sampling_thread is not None:
+            self._sampling_thread.join()
+        return self._samples
+
+    def _sample(self) -> None:
+        while not self._stop_event.wait(self._interval_seconds):
+            # noinspection PyProtectedMember
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._samples[_collapse_stack(frame)] += 1
+
+
+def _collapse_stack(frame: FrameType | None) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(
+            f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+def format_collapsed_stacks(samples: Counter[str]) -> str:
+    """
+    Format the samples as collapsed stacks (one "frame;frame;frame count" line per stack),
+    the input format of flamegraph.pl and speedscope.
+    :param samples: number of samples of each collapsed stack
+    :return:
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, SecretStr
+
+
+class ProfilingSettings(BaseModel):
+    token: SecretStr | None = None
+    """Value of the X-Profile header requesting the profiling of a request, the header is ignored if not set"""
+    sample_rate: float = 0
+    """Fraction of the requests profiled regardless of the header"""
+    interval_seconds: float = 0.005
+    """Interval between two samples of the stack"""
+    output_path: str = "profiles"
+    """Folder of the collapsed stack files, named after the request id"""
+
+    @property
+    def enabled(self) -> bool:
+        return self.token is not None or self.sample_rate > 0
@@ -1,6 +1,18 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from enum import Enum
-from typing import Any, Union, Annotated, Literal, Optional, Callable
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    Union,
+    Annotated,
+    Literal,
+    Optional,
+    Callable,
+    ClassVar,
+    Hashable,
+)
 
 from pydantic import BaseModel, Field as PydanticField, Tag, Discriminator
 from sqlmodel import bindparam, func, and_, or_, not_
@@ -9,6 +21,8 @@ from sqlmodel import bindparam, func, and_, or_, not_
 class Field:
     name: str
     database_column: Any
+    operators: frozenset[str] | None
+    """Operators allowed on the field, all of them if None"""
 
     _transform_function: Optional[Callable]
 
@@ -17,11 +31,24 @@ class Field:
         name: str,
         database_column: Any,
         transform_function: Optional[Callable] = None,
+        operators: Iterable[str] | None = None,
     ):
+        """
+        :param name: name of the field in the rules
+        :param database_column: column (or expression) the rules apply to
+        :param transform_function: applied to the values of the rules
+        :param operators: operators allowed on the field, all of them if None
+            (e.g. without TEXT_OPERATORS, if the column is not a text)
+        """
         self.name = name
         self.database_column = database_column
+        self.operators = frozenset(operators) if operators is not None else None
         self._transform_function = transform_function
 
+    def check_operator(self, operator: str) -> None:
+        if self.operators is not None and operator not in self.operators:
+            raise QueryBuilderOperatorNotAllowedError(self.name, operator)
+
     def transform(self, value: Any) -> Any:
         if self._transform_function is None:
             return value
@@ -42,6 +69,17 @@ class QueryBuilderUnknownFieldError(QueryBuilderSyntaxError):
         super().__init__(f"Unknown query builder field: {field_name}")
 
 
+class QueryBuilderOperatorNotAllowedError(QueryBuilderSyntaxError):
+    def __init__(self, field_name: str, operator: str):
+        super().__init__(
+            f"Operator not allowed on query builder field {field_name}: {operator}"
+        )
+
+
+class QueryBuilderLimitError(QueryBuilderSyntaxError):
+    pass
+
+
 class EngineContext:
     params: dict
     param_counters: dict[str, int]
@@ -55,16 +93,83 @@ class EngineContext:
     def add_param(self, field: Field, value: Any) -> str:
         param_counter = self.param_counters.get(field.name, 0)
         param_name = f"{field.name}_{param_counter}"
-        self.params |= {param_name: value}
-        self.param_counters |= {field.name: param_counter + 1}
+        self.params[param_name] = value
+        self.param_counters[field.name] = param_counter + 1
         return param_name
 
 
+class CompiledRulesCache:
+    """
+    Bounded LRU cache of compiled rules, keyed on the shape of the rule tree.
+    Two trees with the same shape compile to the same SQL expression, with the values only living in the bound
+    parameters, so the expression can be reused and only the parameters need to be bound again.
+    """
+
+    max_size: int
+    hits: int
+    misses: int
+
+    _entries: OrderedDict[Hashable, Any]
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class _IRule(BaseModel, ABC):
     @abstractmethod
     def compile(self, engine_context: EngineContext) -> Any:
         raise NotImplementedError()
 
+    @abstractmethod
+    def fingerprint(self) -> Hashable:
+        """
+        Shape of the rule (fields, operators and conditions, without values).
+        Rules with the same fingerprint compile to the same expression.
+        """
+        raise NotImplementedError()
+
+    def bind_params(self, engine_context: EngineContext) -> None:
+        """
+        Add the parameters of the rule to the engine context without compiling it,
+        in the same order as compile would.
+        """
+        pass
+
+    @abstractmethod
+    def field_operators(self) -> Iterator[tuple[str, str]]:
+        """
+        Fields of the rule with the operator applied to them ("sort" for the order by rules),
+        e.g. to find the indexes that the queries need.
+        """
+        raise NotImplementedError()
+
 
 class _Directions(str, Enum):
     ASC = "asc"
@@ -90,6 +195,12 @@ class _BaseOrderByRule(_IRule):
             raise QueryBuilderUnknownFieldError(self.field) from e
         return self.apply(engine_context, field)
 
+    def fingerprint(self) -> Hashable:
+        return self.field, self.direction.value
+
+    def field_operators(self) -> Iterator[tuple[str, str]]:
+        yield self.field, "sort"
+
 
 class Asc(_BaseOrderByRule):
     direction: Literal[_Directions.ASC] = _Directions.ASC
@@ -165,11 +276,35 @@ class _Operators(str, Enum):
         return self.value
 
 
+ALL_OPERATORS: frozenset[str] = frozenset(operator.value for operator in _Operators)
+
+TEXT_OPERATORS: frozenset[str] = frozenset(
+    {
+        _Operators.IEQUAL.value,
+        _Operators.INOTEQUAL.value,
+        _Operators.LIKE.value,
+        _Operators.ILIKE.value,
+        _Operators.CONTAINS.value,
+        _Operators.ICONTAINS.value,
+        _Operators.STARTSWITH.value,
+        _Operators.ISTARTSWITH.value,
+        _Operators.ENDSWITH.value,
+        _Operators.IENDSWITH.value,
+        _Operators.ISEMPTY.value,
+        _Operators.ISNOTEMPTY.value,
+    }
+)
+"""Operators applying string functions or patterns to the column, so that they only work on the text columns"""
+
+
 class _BaseSimpleWhereRule(_IRule):
     field: str
     operator: _Operators
     value: Any
 
+    _binds_value: ClassVar[bool] = True
+    """Whether the operator sends its value to the database as a bound parameter"""
+
     @abstractmethod
     def apply(
         self,
@@ -184,9 +319,37 @@ class _BaseSimpleWhereRule(_IRule):
             field = engine_context.fields[self.field]
         except KeyError as e:
             raise QueryBuilderUnknownFieldError(self.field) from e
+        field.check_operator(self.operator.value)
         transformed_value = field.transform(self.value)
         return self.apply(engine_context, field, transformed_value)
 
+    def format_value(self, value: Any) -> Any:
+        """
+        Format the (transformed) value before binding it, e.g. to add wildcards.
+        """
+        return value
+
+    def add_param(self, engine_context: EngineContext, field: Field, value: Any) -> str:
+        return engine_context.add_param(field, self.format_value(value))
+
+    def fingerprint(self) -> Hashable:
+        return self.field, self.operator.value
+
+    def field_operators(self) -> Iterator[tuple[str, str]]:
+        yield self.field, self.operator.value
+
+    def bind_params(self, engine_context: EngineContext) -> None:
+        try:
+            field = engine_context.fields[self.field]
+        except KeyError as e:
+            raise QueryBuilderUnknownFieldError(self.field) from e
+        # Checked on the cached path too, the compiled rules are shared by the schemas
+        field.check_operator(self.operator.value)
+        if not self._binds_value:
+            return
+        transformed_value = field.transform(self.value)
+        self.add_param(engine_context, field, transformed_value)
+
 
 _Scalar = str | int | float | bool
 
@@ -202,7 +365,7 @@ class Equal(_BaseSimpleWhereRule):
         value: Any,
     ):
         return field.database_column == bindparam(
-            engine_context.add_param(field, value)
+            self.add_param(engine_context, field, value)
         )
 
 
@@ -216,7 +379,7 @@ class IEqual(Equal):
         value: Any,
     ):
         return func.lower(field.database_column) == func.lower(
-            bindparam(engine_context.add_param(field, value))
+            bindparam(self.add_param(engine_context, field, value))
         )
 
 
@@ -231,7 +394,7 @@ class Like(_BaseSimpleWhereRule):
         value: Any,
     ):
         return field.database_column.like(
-            bindparam(engine_context.add_param(field, value))
+            bindparam(self.add_param(engine_context, field, value))
         )
 
 
@@ -245,7 +408,7 @@ class ILike(Like):
         value: Any,
     ):
         return field.database_column.ilike(
-            bindparam(engine_context.add_param(field, value))
+            bindparam(self.add_param(engine_context, field, value))
         )
 
 
@@ -259,7 +422,7 @@ class NotEqual(Equal):
         value: Any,
     ):
         return field.database_column != bindparam(
-            engine_context.add_param(field, value)
+            self.add_param(engine_context, field, value)
         )
 
 
@@ -273,13 +436,16 @@ class INotEquals(Equal):
         value: Any,
     ):
         return func.lower(field.database_column) != func.lower(
-            bindparam(engine_context.add_param(field, value))
+            bindparam(self.add_param(engine_context, field, value))
         )
 
 
 class Contains(Like):
     operator: Literal[_Operators.CONTAINS] = _Operators.CONTAINS
 
+    def format_value(self, value: Any) -> Any:
+        return f"%{value}%"
+
     def apply(
         self,
         engine_context: EngineContext,
@@ -287,13 +453,16 @@ class Contains(Like):
         value: Any,
     ):
         return field.database_column.like(
-            bindparam(engine_context.add_param(field, f"%{value}%"))
+            bindparam(self.add_param(engine_context, field, value))
         )
 
 
 class IContains(Like):
     operator: Literal[_Operators.ICONTAINS] = _Operators.ICONTAINS
 
+    def format_value(self, value: Any) -> Any:
+        return f"%{value}%"
+
     def apply(
         self,
         engine_context: EngineContext,
@@ -301,7 +470,7 @@ class IContains(Like):
         value: Any,
     ):
         return field.database_column.ilike(
-            bindparam(engine_context.add_param(field, f"%{value}%"))
+            bindparam(self.add_param(engine_context, field, value))
         )
 
 
@@ -315,7 +484,9 @@ class In(_BaseSimpleWhereRule):
         field: Field,
         value: Any,
     ):
-        return field.database_column.in_(tuple(value))
+        return field.database_column.in_(
+            bindparam(self.add_param(engine_context, field, value), expanding=True)
+        )
 
 
 class NotIn(In):
@@ -327,7 +498,9 @@ class NotIn(In):
         field: Field,
         value: Any,
     ):
-        return field.database_column.notin_(tuple(value))
+        return field.database_column.notin_(
+            bindparam(self.add_param(engine_context, field, value), expanding=True)
+        )
 
 
 class GreaterThan(Equal):
@@ -339,7 +512,9 @@ class GreaterThan(Equal):
         field: Field,
         value: Any,
     ):
-        return field.database_column > bindparam(engine_context.add_param(field, value))
+        return field.database_column > bindparam(
+            self.add_param(engine_context, field, value)
+        )
 
 
 class GreaterThanOrEqual(Equal):
@@ -352,7 +527,7 @@ class GreaterThanOrEqual(Equal):
         value: Any,
     ):
         return field.database_column >= bindparam(
-            engine_context.add_param(field, value)
+            self.add_param(engine_context, field, value)
         )
 
 
@@ -365,7 +540,9 @@ class LessThan(Equal):
         field: Field,
         value: Any,
     ):
-        return field.database_column < bindparam(engine_context.add_param(field, value))
+        return field.database_column < bindparam(
+            self.add_param(engine_context, field, value)
+        )
 
 
 class LessThanOrEqual(Equal):
@@ -378,7 +555,7 @@ class LessThanOrEqual(Equal):
         value: Any,
     ):
         return field.database_column <= bindparam(
-            engine_context.add_param(field, value)
+            self.add_param(engine_context, field, value)
         )
 
 
@@ -386,6 +563,8 @@ class IsNull(_BaseSimpleWhereRule):
     operator: Literal[_Operators.ISNULL] = _Operators.ISNULL
     value: None
 
+    _binds_value: ClassVar[bool] = False
+
     def apply(
         self,
         engine_context: EngineContext,
@@ -410,6 +589,8 @@ class IsNotNull(IsNull):
 class IsEmpty(Like):
     operator: Literal[_Operators.ISEMPTY] = _Operators.ISEMPTY
 
+    _binds_value: ClassVar[bool] = False
+
     def apply(
         self,
         engine_context: EngineContext,
@@ -422,6 +603,8 @@ class IsEmpty(Like):
 class IsNotEmpty(Like):
     operator: Literal[_Operators.ISNOTEMPTY] = _Operators.ISNOTEMPTY
 
+    _binds_value: ClassVar[bool] = False
+
     def apply(
         self,
         engine_context: EngineContext,
@@ -434,6 +617,9 @@ class IsNotEmpty(Like):
 class StartsWith(Like):
     operator: Literal[_Operators.STARTSWITH] = _Operators.STARTSWITH
 
+    def format_value(self, value: Any) -> Any:
+        return f"{value}%"
+
     def apply(
         self,
         engine_context: EngineContext,
@@ -441,13 +627,16 @@ class StartsWith(Like):
         value: Any,
     ):
         return field.database_column.like(
-            bindparam(engine_context.add_param(field, f"{value}%"))
+            bindparam(self.add_param(engine_context, field, value))
         )
 
 
 class IStartsWith(Like):
     operator: Literal[_Operators.ISTARTSWITH] = _Operators.ISTARTSWITH
 
+    def format_value(self, value: Any) -> Any:
+        return f"{value}%"
+
     def apply(
         self,
         engine_context: EngineContext,
@@ -455,13 +644,16 @@ class IStartsWith(Like):
         value: Any,
     ):
         return field.database_column.ilike(
-            bindparam(engine_context.add_param(field, f"{value}%"))
+            bindparam(self.add_param(engine_context, field, value))
         )
 
 
 class EndsWith(Like):
     operator: Literal[_Operators.ENDSWITH] = _Operators.ENDSWITH
 
+    def format_value(self, value: Any) -> Any:
+        return f"%{value}"
+
     def apply(
         self,
         engine_context: EngineContext,
@@ -469,13 +661,16 @@ class EndsWith(Like):
         value: Any,
     ):
         return field.database_column.like(
-            bindparam(engine_context.add_param(field, f"%{value}"))
+            bindparam(self.add_param(engine_context, field, value))
         )
 
 
 class IEndsWith(Like):
     operator: Literal[_Operators.IENDSWITH] = _Operators.IENDSWITH
 
+    def format_value(self, value: Any) -> Any:
+        return f"%{value}"
+
     def apply(
         self,
         engine_context: EngineContext,
@@ -483,7 +678,7 @@ class IEndsWith(Like):
         value: Any,
     ):
         return field.database_column.ilike(
-            bindparam(engine_context.add_param(field, f"%{value}"))
+            bindparam(self.add_param(engine_context, field, value))
         )
 
 
@@ -555,6 +750,17 @@ class _BaseComplexWhereRule(_IRule):
         compiled_rules = [rule.compile(engine_context) for rule in self.rules]
         return self.join(compiled_rules)
 
+    def fingerprint(self) -> Hashable:
+        return self.condition.value, tuple(rule.fingerprint() for rule in self.rules)
+
+    def field_operators(self) -> Iterator[tuple[str, str]]:
+        for rule in self.rules:
+            yield from rule.field_operators()
+
+    def bind_params(self, engine_context: EngineContext) -> None:
+        for rule in self.rules:
+            rule.bind_params(engine_context)
+
 
 class And(_BaseComplexWhereRule):
     condition: Literal[_Conditions.AND] = _Conditions.AND
@@ -610,3 +816,34 @@ WhereRule = Annotated[
     | Annotated[ComplexWhereRule, Tag("complex")],
     Discriminator(_discriminate_where_rule),
 ]
+
+
+def check_where_rule_limits(
+    rule: WhereRule, max_depth: int, max_rules: int, max_list_values: int
+) -> None:
+    """
+    Check the size of a where rule, so that a single request cannot send an arbitrarily expensive query.
+    :param rule:
+    :param max_depth: maximum nesting of the rules, a single rule has depth 1
+    :param max_rules: maximum number of rules, conditions included
+    :param max_list_values: maximum number of values of a rule (e.g. in)
+    :raises QueryBuilderLimitError: if a limit is exceeded
+    """
+    rule_count = 0
+    pending = [(rule, 1)]
+    while pending:
+        current, depth = pending.pop()
+        rule_count += 1
+        if depth > max_depth:
+            raise QueryBuilderLimitError(
+                f"Rules nested deeper than the maximum of {max_depth} levels"
+            )
+        if rule_count > max_rules:
+            raise QueryBuilderLimitError(f"More rules than the maximum of {max_rules}")
+
+        if isinstance(current, _BaseComplexWhereRule):
+            pending.extend((r, depth + 1) for r in current.rules)
+        elif isinstance(current.value, list) and len(current.value) > max_list_values:
+            raise QueryBuilderLimitError(
+                f"More values than the maximum of {max_list_values} for the field {current.field}"
+            )
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class QueryBuilderSettings(BaseModel):
+    max_where_length: int = 10_000
+    """Maximum length of the where parameter, checked before it is parsed"""
+    max_depth: int = 5
+    """Maximum nesting of the where rules, a single rule has depth 1"""
+    max_rules: int = 50
+    """Maximum number of where rules, conditions included"""
+    max_list_values: int = 500
+    """Maximum number of values of a where rule (e.g. in)"""
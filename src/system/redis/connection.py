@@ -1,20 +1,101 @@
-from redis.asyncio import Redis
-from fastapi import Depends
+from pydantic import BaseModel
+from redis.asyncio import Redis, BlockingConnectionPool
 
+from system.metrics.registry import metrics_registry
 from system.redis.settings import RedisSettings
 from system.settings import get_redis_settings
 
 
-async def get_redis_connection(
-    settings: RedisSettings = Depends(get_redis_settings),
-) -> Redis:
+class RedisPoolStats(BaseModel):
+    max_connections: int
+    in_use_connections: int
+    available_connections: int
+
+
+_redis_connection_pool: BlockingConnectionPool | None = None
+_redis_connection: Redis | None = None
+
+
+async def open_redis_connection_pool(settings: RedisSettings | None = None) -> None:
     """
-    Get a Redis connection using the provided settings, injectable as a FastAPI dependency.
+    Create the Redis connection pool shared by the FastAPI endpoints, to be called on application startup.
     :param settings:
     :return:
     """
-    async with build_redis_connection(settings) as redis_connection:
-        yield redis_connection
+    global _redis_connection_pool, _redis_connection
+
+    settings = settings or get_redis_settings()
+    _redis_connection_pool = BlockingConnectionPool(
+        max_connections=settings.max_connections,
+        timeout=settings.pool_timeout_seconds,
+        health_check_interval=settings.health_check_interval_seconds,
+        protocol=3,
+        host=settings.host,
+        port=settings.port,
+        db=settings.db,
+        username=settings.username,
+        password=(settings.password.get_secret_value() if settings.password else None),
+    )
+    _redis_connection = Redis.from_pool(_redis_connection_pool)
+
+
+async def close_redis_connection_pool() -> None:
+    """
+    Close the Redis connection pool, to be called on application shutdown.
+    :return:
+    """
+    global _redis_connection_pool, _redis_connection
+
+    if _redis_connection is not None:
+        await _redis_connection.aclose()
+    _redis_connection_pool = None
+    _redis_connection = None
+
+
+def get_redis_pool_stats() -> RedisPoolStats | None:
+    """
+    Usage of the Redis connection pool, None if the pool is not open.
+    :return:
+    """
+    pool = _redis_connection_pool
+    if pool is None:
+        return None
+
+    # noinspection PyProtectedMember
+    return RedisPoolStats(
+        max_connections=pool.max_connections,
+        in_use_connections=len(pool._in_use_connections),
+        available_connections=len(pool._available_connections),
+    )
+
+
+_pool_connections = metrics_registry.gauge(
+    "redis_pool_connections",
+    "Connections of the Redis pool",
+    ("state",),
+)
+
+
+def _collect_pool_metrics() -> None:
+    stats = get_redis_pool_stats()
+    if stats is None:
+        return
+    _pool_connections.set(("in_use",), stats.in_use_connections)
+    _pool_connections.set(("available",), stats.available_connections)
+    _pool_connections.set(("max",), stats.max_connections)
+
+
+metrics_registry.add_collector(_collect_pool_metrics)
+
+
+async def get_redis_connection() -> Redis:
+    """
+    Get the Redis connection backed by the shared connection pool, injectable as a FastAPI dependency.
+    :return:
+    """
+    if _redis_connection is None:
+        raise RuntimeError("The Redis connection pool is not open")
+    return _redis_connection
 
 
 def build_redis_connection(settings: RedisSettings | None = None) -> Redis:
@@ -0,0 +1,180 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import TypeVar, Any
+
+import orjson
+from fastapi import Depends
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from system.redis.connection import get_redis_connection
+from system.redis.settings import RedisSettings
+from system.settings import get_redis_settings
+
+_logger = logging.getLogger(__name__)
+
+_TEntity = TypeVar("_TEntity", bound=BaseModel)
+
+
+class _LocalCache:
+    """
+    In-process LRU cache, with a short TTL since it is not invalidated by the other workers.
+    """
+
+    max_size: int
+    ttl_seconds: float
+
+    _entries: OrderedDict[str, tuple[float, bytes]]
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_local_cache: _LocalCache | None = None
+
+
+def _get_local_cache(settings: RedisSettings) -> _LocalCache:
+    global _local_cache
+
+    if _local_cache is None:
+        _local_cache = _LocalCache(
+            settings.entity_cache_local_size,
+            settings.entity_cache_local_ttl_seconds,
+        )
+    return _local_cache
+
+
+_INVALIDATED = b""
+"""Value of an invalidated entity, that the reads started before the change cannot overwrite"""
+
+
+class EntityCache:
+    """
+    Read-through cache of entities, kept in Redis and in a small in-process cache in front of it.
+    An invalidated entity is kept as a tombstone for entity_cache_invalidation_seconds, and the entities are only
+    cached if absent: a read of the previous data, started before the change and finishing after the invalidation,
+    cannot cache it again unless it takes longer than the tombstone. The in-process caches of the other workers
+    can still return the previous data for entity_cache_local_ttl_seconds.
+    """
+
+    _redis: Redis
+    _settings: RedisSettings
+    _local_cache: _LocalCache
+
+    def __init__(
+        self,
+        redis: Redis = Depends(get_redis_connection),
+        settings: RedisSettings = Depends(get_redis_settings),
+    ):
+        self._redis = redis
+        self._settings = settings
+        self._local_cache = _get_local_cache(settings)
+
+    @staticmethod
+    def _build_key(entity_type: type[BaseModel], entity_id: Any) -> str:
+        return f"entity:{entity_type.__name__}:{entity_id}"
+
+    async def get(self, entity_type: type[_TEntity], entity_id: Any) -> _TEntity | None:
+        """
+        Get an entity from the cache
+        :param entity_type: the schema of the entity
+        :param entity_id:
+        :return: the entity, None if it is not cached
+        """
+        key = self._build_key(entity_type, entity_id)
+
+        value = self._local_cache.get(key)
+        if value is None:
+            try:
+                value = await self._redis.get(key)
+            except RedisError as e:
+                _logger.warning("Entity cache unavailable: %s", e)
+                return None
+            if value is None or value == _INVALIDATED:
+                return None
+            self._local_cache.set(key, value)
+
+        return entity_type.model_validate(orjson.loads(value))
+
+    async def set(self, entity: BaseModel, entity_id: Any) -> None:
+        """
+        Add an entity to the cache, unless it is cached or has just been invalidated
+        :param entity:
+        :param entity_id:
+        :return:
+        """
+        key = self._build_key(type(entity), entity_id)
+        value = orjson.dumps(entity.model_dump())
+
+        try:
+            cached = await self._redis.set(
+                key, value, ex=self._settings.entity_cache_ttl_seconds, nx=True
+            )
+        except RedisError as e:
+            _logger.warning("Entity cache unavailable: %s", e)
+            return
+        if cached:
+            self._local_cache.set(key, value)
+
+    async def invalidate(self, entity_type: type[BaseModel], entity_id: Any) -> None:
+        """
+        Remove an entity from the cache, to be called after the changes to the entity are committed.
+        :param entity_type: the schema of the entity
+        :param entity_id:
+        :return:
+        """
+        await self.invalidate_many(entity_type, [entity_id])
+
+    async def invalidate_many(
+        self, entity_type: type[BaseModel], entity_ids: list[Any]
+    ) -> None:
+        """
+        Remove several entities from the cache, with a single round trip to Redis.
+        :param entity_type: the schema of the entities
+        :param entity_ids:
+        :return:
+        """
+        if not entity_ids:
+            return
+        keys = [self._build_key(entity_type, entity_id) for entity_id in entity_ids]
+
+        for key in keys:
+            self._local_cache.delete(key)
+        try:
+            async with self._redis.pipeline(transaction=False) as pipeline:
+                for key in keys:
+                    pipeline.set(
+                        key,
+                        _INVALIDATED,
+                        ex=self._settings.entity_cache_invalidation_seconds,
+                    )
+                await pipeline.execute()
+        except RedisError as e:
+            _logger.warning("Entity cache unavailable: %s", e)
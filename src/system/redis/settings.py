@@ -7,3 +7,11 @@ class RedisSettings(BaseModel):
     db: int
     username: str | None = None
     password: SecretStr | None = None
+    count_cache_ttl_seconds: int = 30
+    entity_cache_ttl_seconds: int = 300
+    entity_cache_local_size: int = 1024
+    entity_cache_local_ttl_seconds: float = 5
+    entity_cache_invalidation_seconds: int = 10
+    max_connections: int = 50
+    pool_timeout_seconds: float = 5
+    health_check_interval_seconds: int = 30
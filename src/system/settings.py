@@ -8,10 +8,13 @@ from pydantic_settings import (
     YamlConfigSettingsSource,
 )
 
-from system.authentication.settings import AuthSettings
+from system.authentication.settings import AuthSettings, PasswordHashingSettings
 from system.database.settings import DatabaseSettings, DatabaseId
 from system.datetime.settings import DatetimeSettings
 from system.logging.settings import LoggingSettings
+from system.metrics.settings import MetricsSettings
+from system.profiling.settings import ProfilingSettings
+from system.query_builder_settings import QueryBuilderSettings
 from system.redis.settings import RedisSettings
 
 
@@ -47,6 +50,9 @@ class Settings(BaseSettings):
     datetime: DatetimeSettings
     databases: dict[DatabaseId, DatabaseSettings]
     auth: AuthSettings
+    metrics: MetricsSettings = MetricsSettings()
+    profiling: ProfilingSettings = ProfilingSettings()
+    query_builder: QueryBuilderSettings = QueryBuilderSettings()
 
 
 @lru_cache
@@ -73,3 +79,18 @@ def get_database_settings(database_id: DatabaseId) -> DatabaseSettings:
 @lru_cache
 def get_logging_settings() -> LoggingSettings:
     return get_settings().logging
+
+
+@lru_cache
+def get_password_hashing_settings() -> PasswordHashingSettings:
+    return get_settings().auth.password_hashing
+
+
+@lru_cache
+def get_metrics_settings() -> MetricsSettings:
+    return get_settings().metrics
+
+
+@lru_cache
+def get_query_builder_settings() -> QueryBuilderSettings:
+    return get_settings().query_builder
@@ -0,0 +1,100 @@
+import time
+from typing import Any, Callable
+
+from sqlalchemy import Engine, create_engine
+from sqlmodel import Session, select
+from uuid6 import uuid7
+
+from app.api.schema.customer_schema import UserSchema
+from app.api.schema.shared.pagination import PaginationParams
+from app.core.models.main.user import User
+
+# Measures the Python side of fetching a page of GET /v4/users?limit=300 and building its schemas:
+# - entities: select(User) materialized as ORM entities, in a regular session (the previous implementation)
+# - columns: the schema projection materialized as row tuples, in a session without autoflush (read-only mode)
+# The database is SQLite in memory, whose default schema is named main like the schema of the users,
+# so that the measure does not depend on the network and on Postgres.
+#
+# Run from the tests folder, with src in the PYTHONPATH:
+#   python -m benchmarks.bench_list_query
+
+_ROWS = 300
+
+
+def _create_database() -> Engine:
+    engine = create_engine("sqlite://")
+    User.metadata.create_all(engine, tables=[User.__table__])
+    with Session(engine) as session:
+        session.add_all(
+            User(
+                id=uuid7(),
+                name=f"User {i}",
+                email=f"user{i}@example.com",
+                phone="555-0100",
+                address=f"{i} Main Street\nSpringfield, IL 62701",
+                password_hash="$argon2id$v=19$m=65536,t=2,p=1$" + "x" * 66,
+            )
+            for i in range(_ROWS + 1)
+        )
+        session.commit()
+    return engine
+
+
+def _measure(function: Callable[[], Any], iterations: int) -> float:
+    for _ in range(5):
+        function()
+
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        best = min(best, (time.perf_counter() - start) / iterations * 1_000_000)
+    return best
+
+
+def run_benchmark(iterations: int = 30) -> None:
+    engine = _create_database()
+    pagination = PaginationParams(skip=0, limit=_ROWS)
+
+    def entities() -> list[UserSchema]:
+        with Session(engine, expire_on_commit=False) as session:
+            rows = session.exec(
+                UserSchema.build_query(select(User), limit=pagination.limit + 1)
+            ).all()
+            page, _, _ = UserSchema.get_page(rows, pagination)
+            return [
+                UserSchema(
+                    id=d.id,
+                    name=d.name,
+                    email=d.email,
+                    phone=d.phone,
+                    address=d.address,
+                )
+                for d in page
+            ]
+
+    def columns() -> list[UserSchema]:
+        with Session(engine, expire_on_commit=False, autoflush=False) as session:
+            rows = session.exec(
+                UserSchema.build_query(
+                    select(*UserSchema.get_projection(User)),
+                    limit=pagination.limit + 1,
+                )
+            ).all()
+            page, _, _ = UserSchema.get_page(rows, pagination)
+            return UserSchema.from_rows(page)
+
+    # Both return the same schemas
+    assert entities() == columns()
+
+    entities_us = _measure(entities, iterations)
+    columns_us = _measure(columns, iterations)
+
+    print(f"Rows: {_ROWS}")
+    print(f"Entities: {entities_us:8.0f} us/request {entities_us / _ROWS:6.2f} us/row")
+    print(f"Columns:  {columns_us:8.0f} us/request {columns_us / _ROWS:6.2f} us/row")
+
+
+if __name__ == "__main__":
+    run_benchmark()
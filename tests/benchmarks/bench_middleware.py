@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI, Request, Response, status
+from h11 import LocalProtocolError
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import ClientDisconnect
+from starlette.types import ASGIApp
+
+from system.middleware.request_context import RequestContextMiddleware
+from system.uuids import generate_uuid
+
+# Measures the per-request overhead of the request context middlewares, calling the ASGI application
+# directly (no server, no network), against an application without middlewares.
+#
+# Run from the tests folder, with src in the PYTHONPATH:
+#   python -m benchmarks.bench_middleware
+
+
+def _build_app() -> FastAPI:
+    app = FastAPI(openapi_url=None)
+
+    @app.get("/ping")
+    async def ping():
+        return {"message": "pong"}
+
+    return app
+
+
+def _build_legacy_app() -> FastAPI:
+    """The five stacked middlewares previously registered in main.py"""
+    app = _build_app()
+
+    @app.middleware("http")
+    async def catch_cancelled_request(request: Request, call_next):
+        try:
+            return await call_next(request)
+        except (ClientDisconnect, LocalProtocolError):
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    class SuppressNoResponseReturnedMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request: Request, call_next):
+            try:
+                return await call_next(request)
+            except RuntimeError as exc:
+                if (
+                    str(exc) == "No response returned."
+                    and await request.is_disconnected()
+                ):
+                    return Response(status_code=status.HTTP_204_NO_CONTENT)
+                raise
+
+    # noinspection PyTypeChecker
+    app.add_middleware(SuppressNoResponseReturnedMiddleware)
+
+    @app.middleware("http")
+    async def log_request(request: Request, call_next):
+        request_logger = request.state.request_logger
+        request_logger.info(f"Request: {request.method} {request.url}")
+        response = await call_next(request)
+        request_logger.info(f"Response: {response.status_code}")
+        return response
+
+    @app.middleware("http")
+    async def set_request_logger(request: Request, call_next):
+        request.state.request_logger = logging.getLogger(request.state.request_id)
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def set_request_id(request: Request, call_next):
+        request.state.request_id = generate_uuid("REQ")
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request.state.request_id
+        return response
+
+    @app.middleware("http")
+    async def remove_content_type_on_204(request: Request, call_next):
+        response = await call_next(request)
+        if response.status_code == status.HTTP_204_NO_CONTENT:
+            del response.headers["content-type"]
+        return response
+
+    return app
+
+
+def _build_request_context_app() -> FastAPI:
+    app = _build_app()
+    # noinspection PyTypeChecker
+    app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+async def _measure(app: ASGIApp, requests: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"localhost")],
+        "server": ("localhost", 80),
+        "client": ("127.0.0.1", 12345),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(_message):
+        pass
+
+    # Warm-up, also building the middleware stack
+    for _ in range(100):
+        await app(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+async def run_benchmark(requests: int = 20_000) -> None:
+    # The loggers are enabled at WARNING, so that the cost of writing the logs is not measured
+    logging.basicConfig(level=logging.WARNING)
+
+    baseline = await _measure(_build_app(), requests)
+    legacy = await _measure(_build_legacy_app(), requests)
+    request_context = await _measure(_build_request_context_app(), requests)
+
+    print(f"No middleware:              {baseline:8.1f} us/request")
+    print(
+        f"Stacked HTTP middlewares:   {legacy:8.1f} us/request (+{legacy - baseline:.1f} us)"
+    )
+    print(
+        f"RequestContextMiddleware:   {request_context:8.1f} us/request (+{request_context - baseline:.1f} us)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
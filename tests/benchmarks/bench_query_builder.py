@@ -0,0 +1,185 @@
+import argparse
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import orjson
+from pydantic import TypeAdapter
+from sqlmodel import select
+
+from app.api.schema.customer_schema import UserSchema
+from app.api.schema.shared.filtering import FilteringParams
+from app.core.models.main.user import User
+from system.query_builder import EngineContext, WhereRule
+
+# Measures the parsing (validation of the where JSON, as done by FilteringParams) and the compilation
+# of query builder trees of varying depth, width and operator mix, and compares the results with a baseline.
+#
+# Run from the tests folder, with src in the PYTHONPATH:
+#   python -m benchmarks.bench_query_builder                    # compare with the baseline, exit 1 on regressions
+#   python -m benchmarks.bench_query_builder --update-baseline  # record the baseline
+#
+# The baseline depends on the machine, so it should be recorded on the machine running the checks.
+
+_BASELINE_PATH = Path(__file__).parent / "query_builder_baseline.json"
+
+_OPERATORS = [
+    ("equal", "test_user"),
+    ("iequal", "Test_User"),
+    ("icontains", "user"),
+    ("startswith", "test"),
+    ("iendswith", ".COM"),
+    ("notequal", "other"),
+    ("in", ["a", "b", "c", "d"]),
+    ("notin", ["e", "f"]),
+    ("greaterthan", "m"),
+    ("isnull", None),
+]
+_FIELDS = ["name", "email"]
+
+_where_rule_adapter = TypeAdapter(WhereRule)
+
+
+def _build_tree(depth: int, width: int, operators: itertools.cycle) -> dict:
+    """Tree of and/or conditions with the given depth, each with width children, leaves cycling over the operators"""
+    if depth == 0:
+        operator, value = next(operators)
+        field = _FIELDS[len(operator) % len(_FIELDS)]
+        return {"field": field, "operator": operator, "value": value}
+    return {
+        "condition": "and" if depth % 2 else "or",
+        "rules": [_build_tree(depth - 1, width, operators) for _ in range(width)],
+    }
+
+
+def _build_cases() -> dict[str, str]:
+    shapes = {
+        "single_rule": (0, 1),
+        "flat_5": (1, 5),
+        "flat_20": (1, 20),
+        "depth_3_width_3": (3, 3),
+        "depth_4_width_2": (4, 2),
+        "depth_2_width_6": (2, 6),
+    }
+    return {
+        name: orjson.dumps(
+            _build_tree(depth, width, itertools.cycle(_OPERATORS))
+        ).decode()
+        for name, (depth, width) in shapes.items()
+    }
+
+
+def _measure(
+    function: Callable[[], object], rounds: int = 5, round_seconds: float = 0.05
+) -> float:
+    """
+    Duration of a call in microseconds: the best mean of several rounds, each repeating the calls
+    for at least round_seconds, so that the results are not skewed by the noise of the machine.
+    """
+    function()
+    best = float("inf")
+    for _ in range(rounds):
+        iterations = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < round_seconds:
+            for _ in range(10):
+                function()
+            iterations += 10
+            elapsed = time.perf_counter() - start
+        best = min(best, elapsed / iterations * 1_000_000)
+    return best
+
+
+def run_benchmark() -> dict[str, dict[str, float]]:
+    fields = UserSchema.get_query_builder_fields()
+    results = {}
+    for name, where_json in _build_cases().items():
+        # The cases must be within the limits of the requests
+        FilteringParams(where=where_json)
+        where = _where_rule_adapter.validate_json(where_json)
+
+        def build_query():
+            UserSchema.build_query(select(User), limit=100, where=where)
+
+        results[name] = {
+            "parse_us": _measure(lambda: _where_rule_adapter.validate_json(where_json)),
+            "compile_us": _measure(lambda: where.compile(EngineContext(fields))),
+            "bind_params_us": _measure(
+                lambda: where.bind_params(EngineContext(fields))
+            ),
+            # Compiled rules cache hit, as for the repeated filters
+            "build_query_us": _measure(build_query),
+        }
+    return results
+
+
+def _compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+) -> list[str]:
+    regressions = []
+    for name, measures in results.items():
+        for measure, value in measures.items():
+            baseline_value = baseline.get(name, {}).get(measure)
+            if baseline_value is None:
+                continue
+            change = value / baseline_value - 1
+            marker = ""
+            if change > tolerance:
+                marker = "  REGRESSION"
+                regressions.append(f"{name}.{measure}")
+            print(
+                f"{name:20} {measure:16} {value:10.1f} us (baseline {baseline_value:10.1f} us, {change:+.0%}){marker}"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="record the results as the new baseline",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="relative slowdown from the baseline considered a regression (default: 0.5)",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmark()
+
+    if args.update_baseline or not _BASELINE_PATH.exists():
+        _BASELINE_PATH.write_text(
+            json.dumps(
+                {
+                    name: {m: round(v, 2) for m, v in measures.items()}
+                    for name, measures in results.items()
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        for name, measures in results.items():
+            print(f"{name:20} " + " ".join(f"{m}={v:.1f}" for m, v in measures.items()))
+        print(f"Baseline written to {_BASELINE_PATH}")
+        return 0
+
+    regressions = _compare(
+        results, json.loads(_BASELINE_PATH.read_text()), args.tolerance
+    )
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
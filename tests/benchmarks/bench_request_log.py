@@ -0,0 +1,88 @@
+import json
+import logging
+import time
+from typing import Callable
+
+from app.api.schema.shared.counting import CountingParams
+from app.api.schema.shared.filtering import FilteringParams
+from app.api.schema.shared.pagination import get_pagination
+from app.api.schema.shared.sorting import SortingParams
+from system.logging.api_logger import RequestLog, log_request_input
+
+# Measures the cost of logging the input of the get_all endpoint, building the RequestLog eagerly
+# (logger.debug(RequestLog(...))) or through log_request_input, with the logger enabled at INFO
+# (the RequestLog is discarded) and at DEBUG (the RequestLog is formatted by a handler).
+#
+# Run from the tests folder, with src in the PYTHONPATH:
+#   python -m benchmarks.bench_request_log
+
+
+class _FormattingHandler(logging.Handler):
+    """Handler formatting the records without writing them, to measure the serialization only"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.format(record)
+
+
+def _build_params() -> dict:
+    where = {
+        "condition": "and",
+        "rules": [
+            {"field": "name", "operator": "icontains", "value": "user"},
+            {
+                "condition": "or",
+                "rules": [
+                    {"field": "email", "operator": "endswith", "value": ".com"},
+                    {"field": "phone", "operator": "isnotnull", "value": None},
+                ],
+            },
+        ],
+    }
+    order_by = [{"field": "name", "direction": "asc"}]
+
+    return {
+        "filtering": FilteringParams(where=json.dumps(where)),
+        "sorting": SortingParams(orderBy=json.dumps(order_by)),
+        "pagination": get_pagination(100, 300)(skip=0, limit=100),
+        "counting": CountingParams(),
+    }
+
+
+def _measure(log: Callable[[], None], iterations: int) -> float:
+    for _ in range(1000):
+        log()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        log()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def run_benchmark(iterations: int = 50_000) -> None:
+    logger = logging.getLogger("bench_request_log")
+    logger.propagate = False
+    logger.addHandler(_FormattingHandler())
+
+    params = _build_params()
+
+    # As in the controller, the input dict is built on each request
+    def log_eagerly():
+        logger.debug(RequestLog(input=dict(params)))
+
+    def log_lazily():
+        log_request_input(logger, dict(params))
+
+    for level in (logging.INFO, logging.DEBUG):
+        logger.setLevel(level)
+        level_iterations = iterations if level == logging.INFO else iterations // 10
+
+        eager = _measure(log_eagerly, level_iterations)
+        lazy = _measure(log_lazily, level_iterations)
+
+        print(f"{logging.getLevelName(level)}:")
+        print(f"  logger.debug(RequestLog(...)): {eager:8.2f} us/request")
+        print(f"  log_request_input(...):        {lazy:8.2f} us/request")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from uuid6 import uuid7
+
+from app.api.schema.customer_schema import UserSchema, GetAllUsersResponse
+from app.api.schema.shared.base import PageMeta
+from app.api.schema.shared.responses import SchemaResponse
+from app.core.models.main.user import User
+from main import fastapi_app
+
+# Measures the cost of serializing the response of GET /v4/users?limit=300, built from the database rows:
+# - FastAPI: the response returned to FastAPI, which validates and dumps the response model again
+#   before ORJSONResponse serializes it (the previous implementation)
+# - single pass: the response serialized once, straight to bytes, by SchemaResponse
+# The schemas are built from the rows in the same way by both, so they are built once, outside the measure.
+#
+# Run from the tests folder, with src in the PYTHONPATH:
+#   python -m benchmarks.bench_user_response
+
+_ROWS = 300
+
+
+def _build_rows() -> list[User]:
+    return [
+        User(
+            id=uuid7(),
+            name=f"User {i}",
+            email=f"user{i}@example.com",
+            phone="555-0100",
+            address=f"{i} Main Street\nSpringfield, IL 62701",
+            password_hash="",
+        )
+        for i in range(_ROWS)
+    ]
+
+
+def _get_all_route() -> APIRoute:
+    return next(
+        route
+        for route in fastapi_app.routes
+        if isinstance(route, APIRoute)
+        and route.path == "/api/v4/users"
+        and "GET" in route.methods
+    )
+
+
+async def _measure(function: Callable[[], Awaitable[Any]], iterations: int) -> float:
+    for _ in range(10):
+        await function()
+
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await function()
+        best = min(best, (time.perf_counter() - start) / iterations * 1_000_000)
+    return best
+
+
+async def run_benchmark(iterations: int = 50) -> None:
+    route = _get_all_route()
+    response = GetAllUsersResponse.model_construct(
+        data=[
+            UserSchema(
+                id=d.id,
+                name=d.name,
+                email=d.email,
+                phone=d.phone,
+                address=d.address,
+            )
+            for d in _build_rows()
+        ],
+        meta=PageMeta.model_construct(count=_ROWS),
+    )
+
+    async def fastapi_serialized() -> bytes:
+        # What FastAPI does with the value returned by the endpoint
+        content = await serialize_response(
+            field=route.response_field,
+            response_content=response,
+            exclude_none=True,
+            is_coroutine=True,
+        )
+        return ORJSONResponse(content).body
+
+    async def single_pass() -> bytes:
+        return SchemaResponse(response, exclude_none=True).body
+
+    # Both return the same JSON
+    assert orjson.loads(await fastapi_serialized()) == orjson.loads(await single_pass())
+
+    fastapi_us = await _measure(fastapi_serialized, iterations)
+    single_pass_us = await _measure(single_pass, iterations)
+
+    print(f"Rows: {_ROWS}")
+    print(
+        f"Serialized by FastAPI:       {fastapi_us:8.0f} us/request {fastapi_us / _ROWS:6.2f} us/row"
+    )
+    print(
+        f"Single pass, SchemaResponse: {single_pass_us:8.0f} us/request {single_pass_us / _ROWS:6.2f} us/row"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -1,6 +1,13 @@
+import os
+
 import pytest
 from fastapi.testclient import TestClient
 
+# /metrics is only served with a token (see MetricsSettings), read when the app is imported.
+# The environment overrides settings.yaml, unless the variable is already set.
+os.environ.setdefault("METRICS__TOKEN", "test-metrics-token")
+
+# pylint: disable=wrong-import-position
 from main import fastapi_app
 from system.settings import Settings
 
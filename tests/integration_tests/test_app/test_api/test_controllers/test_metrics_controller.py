@@ -0,0 +1,65 @@
+import json
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from system.settings import Settings
+from utils.assertions import assert_api_error_format
+
+
+class TestGet:
+    ENDPOINT = "/metrics"
+
+    @pytest.fixture(scope="class")
+    def headers(self, settings: Settings) -> dict[str, str]:
+        return {"Authorization": f"Bearer {settings.metrics.token.get_secret_value()}"}
+
+    def test_ok(self, client: TestClient, headers: dict[str, str]):
+        # Arrange
+        client.get("/api/v4/server-info")
+
+        # Act
+        response = client.get(self.ENDPOINT, headers=headers)
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert (
+            'http_requests_total{method="GET",route="/api/v4/server-info",status="200"}'
+            in response.text
+        )
+        assert "# TYPE http_request_duration_seconds histogram" in response.text
+        assert "# TYPE db_pool_checkout_duration_seconds histogram" in response.text
+
+    def test_operator_usage(self, client: TestClient, headers: dict[str, str]):
+        # Arrange
+        client.get(
+            "/api/v4/users",
+            params={
+                "where": json.dumps(
+                    {"field": "name", "operator": "icontains", "value": "test"}
+                )
+            },
+        )
+
+        # Act
+        response = client.get(self.ENDPOINT, headers=headers)
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert (
+            'query_builder_operator_usage_total{table="main.user",column="name",operator="icontains"}'
+            in response.text
+        )
+
+    def test_invalid_token(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(
+            self.ENDPOINT, headers={"Authorization": "Bearer invalid-token"}
+        )
+
+        # Assert
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert_api_error_format(response)
@@ -1,11 +1,20 @@
+import json
+
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
 
 from app.core.models.main.user import User
+from main import fastapi_app
+from system.authentication.password_hasher import (
+    PasswordHasher,
+    PasswordHasherBusyError,
+)
 from system.database.session import DatabaseSession
+from system.settings import get_redis_settings
 from system.database.settings import DatabaseId
 from utils.assertions import assert_api_error_format
+from utils.caches import build_redis, clear_caches
 from utils.queries import execute_raw_queries
 from utils.uuids import mock_uuid
 import nacl.pwhash
@@ -19,6 +28,7 @@ class TestGetAll:
         with DatabaseSession.get(DatabaseId.MAIN) as session:
             _ = execute_raw_queries(session, "TRUNCATE TABLE main.user CASCADE")
             session.commit()
+        clear_caches()
 
     def test_ok(self, client: TestClient):
         # Arrange
@@ -68,6 +78,337 @@ class TestGetAll:
             "meta": {"count": 0},
         }
 
+    @pytest.mark.parametrize("name", ["test_user", "test_user2"])
+    def test_filtered(self, client: TestClient, name: str):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                    VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address'),
+                           ('{mock_uuid(2)}', 'test_user2', 'test_email2', 'test_phone2', 'test_address2')""",
+            )
+            session.commit()
+
+        # Act
+        response = client.get(
+            self.ENDPOINT,
+            params={
+                "where": json.dumps(
+                    {"field": "name", "operator": "equal", "value": name}
+                )
+            },
+        )
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert [d["name"] for d in response.json()["data"]] == [name]
+        assert response.json()["meta"] == {"count": 1}
+
+    def test_server_timing(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(self.ENDPOINT, params={"count": "none"})
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["Server-Timing"].startswith("db;dur=")
+        assert 'desc="1 queries"' in response.headers["Server-Timing"]
+
+    def test_count_none(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(self.ENDPOINT, params={"count": "none"})
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"data": [], "meta": {}}
+
+    def test_count_estimate(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(self.ENDPOINT, params={"count": "estimate"})
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert isinstance(response.json()["meta"]["count"], int)
+
+    def test_count_window(self, client: TestClient):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                    VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address'),
+                           ('{mock_uuid(2)}', 'test_user2', 'test_email2', 'test_phone2', 'test_address2')""",
+            )
+            session.commit()
+
+        # Act
+        response = client.get(self.ENDPOINT, params={"count": "window", "limit": 1})
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert [d["id"] for d in response.json()["data"]] == [mock_uuid(1)]
+        assert response.json()["meta"]["count"] == 2
+
+    def test_count_window_empty_page(self, client: TestClient):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                    VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address'),
+                           ('{mock_uuid(2)}', 'test_user2', 'test_email2', 'test_phone2', 'test_address2')""",
+            )
+            session.commit()
+
+        # Act
+        response = client.get(self.ENDPOINT, params={"count": "window", "skip": 5})
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["data"] == []
+        assert response.json()["meta"]["count"] == 2
+
+    def test_count_cached(self, client: TestClient):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                    VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address'),
+                           ('{mock_uuid(2)}', 'test_user2', 'test_email2', 'test_phone2', 'test_address2')""",
+            )
+            session.commit()
+        params = {"count": "cached", "limit": 1}
+
+        # Act
+        miss_response = client.get(self.ENDPOINT, params=params)
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                    VALUES ('{mock_uuid(3)}', 'test_user3', 'test_email3', 'test_phone3', 'test_address3')""",
+            )
+            session.commit()
+        hit_response = client.get(self.ENDPOINT, params=params)
+        with build_redis() as redis:
+            count_keys = redis.keys("count:*")
+            count_ttls = [redis.ttl(key) for key in count_keys]
+            # Expired
+            redis.delete(*count_keys)
+        expired_response = client.get(self.ENDPOINT, params=params)
+
+        # Assert
+        assert miss_response.json()["meta"]["count"] == 2
+        assert hit_response.json()["meta"]["count"] == 2
+        assert len(count_keys) == 1
+        assert 0 < count_ttls[0] <= get_redis_settings().count_cache_ttl_seconds
+        assert expired_response.json()["meta"]["count"] == 3
+
+    def test_cursor_pagination(self, client: TestClient):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                    VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address'),
+                           ('{mock_uuid(2)}', 'test_user2', 'test_email2', 'test_phone2', 'test_address2'),
+                           ('{mock_uuid(3)}', 'test_user3', 'test_email3', 'test_phone3', 'test_address3')""",
+            )
+            session.commit()
+        sort = json.dumps([{"field": "name", "direction": "desc"}])
+
+        # Act
+        first_page = client.get(self.ENDPOINT, params={"sort": sort, "limit": 2})
+        second_page = client.get(
+            self.ENDPOINT,
+            params={
+                "sort": sort,
+                "limit": 2,
+                "after": first_page.json()["meta"]["nextCursor"],
+            },
+        )
+        previous_page = client.get(
+            self.ENDPOINT,
+            params={
+                "sort": sort,
+                "limit": 2,
+                "before": second_page.json()["meta"]["previousCursor"],
+            },
+        )
+
+        # Assert
+        assert first_page.status_code == status.HTTP_200_OK
+        assert [d["id"] for d in first_page.json()["data"]] == [
+            mock_uuid(3),
+            mock_uuid(2),
+        ]
+        assert "previousCursor" not in first_page.json()["meta"]
+
+        assert second_page.status_code == status.HTTP_200_OK
+        assert [d["id"] for d in second_page.json()["data"]] == [mock_uuid(1)]
+        assert "nextCursor" not in second_page.json()["meta"]
+
+        assert previous_page.status_code == status.HTTP_200_OK
+        assert previous_page.json()["data"] == first_page.json()["data"]
+
+    def test_invalid_cursor(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(self.ENDPOINT, params={"after": "invalid"})
+
+        # Assert
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert_api_error_format(response)
+
+    def test_operator_not_allowed(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(
+            self.ENDPOINT,
+            params={
+                "where": json.dumps(
+                    {"field": "id", "operator": "contains", "value": "test"}
+                )
+            },
+        )
+
+        # Assert
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert_api_error_format(response)
+
+    def test_where_too_deep(self, client: TestClient):
+        # Arrange
+        where = {"field": "name", "operator": "equal", "value": "test_user"}
+        for _ in range(10):
+            where = {"condition": "and", "rules": [where]}
+
+        # Act
+        response = client.get(self.ENDPOINT, params={"where": json.dumps(where)})
+
+        # Assert
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert_api_error_format(response)
+
+    def test_in_too_many_values(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(
+            self.ENDPOINT,
+            params={
+                "where": json.dumps(
+                    {
+                        "field": "name",
+                        "operator": "in",
+                        "value": [str(i) for i in range(501)],
+                    }
+                )
+            },
+        )
+
+        # Assert
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert_api_error_format(response)
+
+    def test_fields(self, client: TestClient):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address)
+                    VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address'),
+                           ('{mock_uuid(2)}', 'test_user2', 'test_email2', 'test_phone2', 'test_address2')""",
+            )
+            session.commit()
+        sort = json.dumps([{"field": "email", "direction": "desc"}])
+
+        # Act
+        response = client.get(
+            self.ENDPOINT, params={"fields": "name", "sort": sort, "limit": 1}
+        )
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["data"] == [{"id": mock_uuid(2), "name": "test_user2"}]
+        assert response.json()["meta"]["nextCursor"]
+
+    def test_unknown_field(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(self.ENDPOINT, params={"fields": "name,passwordHash"})
+
+        # Assert
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert_api_error_format(response)
+
+
+class TestExport:
+    ENDPOINT = "/api/v4/users/export"
+
+    @pytest.fixture(scope="function", autouse=True)
+    def reset_data(self):
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(session, "TRUNCATE TABLE main.user CASCADE")
+            session.commit()
+        clear_caches()
+
+    @pytest.fixture(scope="function", autouse=True)
+    def seed_data(self, reset_data):
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                    VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address'),
+                           ('{mock_uuid(2)}', 'test_user2', 'test_email2', 'test_phone2', 'test_address2')""",
+            )
+            session.commit()
+
+    def test_ndjson(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(self.ENDPOINT, params={"sort": '[{"field": "id"}]'})
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.text.splitlines()] == [
+            {
+                "id": mock_uuid(1),
+                "name": "test_user",
+                "email": "test_email",
+                "phone": "test_phone",
+                "address": "test_address",
+            },
+            {
+                "id": mock_uuid(2),
+                "name": "test_user2",
+                "email": "test_email2",
+                "phone": "test_phone2",
+                "address": "test_address2",
+            },
+        ]
+
+    def test_csv(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(
+            self.ENDPOINT,
+            params={
+                "format": "csv",
+                "where": '{"field": "name", "operator": "equal", "value": "test_user2"}',
+            },
+        )
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.text.splitlines() == [
+            "id,name,email,phone,address",
+            f"{mock_uuid(2)},test_user2,test_email2,test_phone2,test_address2",
+        ]
+
 
 class TestGet:
     ENDPOINT = "/api/v4/users/{user_id}"
@@ -77,6 +418,7 @@ class TestGet:
         with DatabaseSession.get(DatabaseId.MAIN) as session:
             _ = execute_raw_queries(session, "TRUNCATE TABLE main.user CASCADE")
             session.commit()
+        clear_caches()
 
     def test_ok(self, client: TestClient):
         # Arrange
@@ -122,6 +464,30 @@ class TestGet:
         assert response.status_code == status.HTTP_404_NOT_FOUND
         assert_api_error_format(response)
 
+    def test_malformed_id(self, client: TestClient):
+        # Arrange
+        # Act
+        response = client.get(self.ENDPOINT.format(user_id="not-a-uuid"))
+
+        # Assert
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert_api_error_format(response)
+
+
+class _BusyPasswordHasher:
+    async def hash(self, password: str) -> str:
+        raise PasswordHasherBusyError()
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        raise PasswordHasherBusyError()
+
+
+@pytest.fixture
+def busy_password_hasher():
+    fastapi_app.dependency_overrides[PasswordHasher] = _BusyPasswordHasher
+    yield
+    fastapi_app.dependency_overrides.pop(PasswordHasher)
+
 
 class TestCreate:
     ENDPOINT = "/api/v4/users"
@@ -131,6 +497,7 @@ class TestCreate:
         with DatabaseSession.get(DatabaseId.MAIN) as session:
             _ = execute_raw_queries(session, "TRUNCATE TABLE main.user CASCADE")
             session.commit()
+        clear_caches()
 
     def test_created(self, client: TestClient):
         # Arrange
@@ -160,6 +527,24 @@ class TestCreate:
         assert data.address == "test_address"
         assert nacl.pwhash.verify(data.password_hash.encode(), "test_password".encode())
 
+    @pytest.mark.usefixtures("busy_password_hasher")
+    def test_password_hasher_busy(self, client: TestClient):
+        # Arrange
+        data = {
+            "name": "test_user",
+            "email": "test_email",
+            "phone": "test_phone",
+            "address": "test_address",
+            "password": "test_password",
+        }
+
+        # Act
+        response = client.post(self.ENDPOINT, json=data)
+
+        # Assert
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert_api_error_format(response)
+
     def test_missing_data(self, client: TestClient):
         # Arrange
         data = {
@@ -209,6 +594,7 @@ class TestUpdate:
         with DatabaseSession.get(DatabaseId.MAIN) as session:
             _ = execute_raw_queries(session, "TRUNCATE TABLE main.user CASCADE")
             session.commit()
+        clear_caches()
 
     def test_ok(self, client: TestClient):
         # Arrange
@@ -244,6 +630,31 @@ class TestUpdate:
         assert data.phone == "test_phone_updated"
         assert data.address == "test_address_updated"
 
+    def test_cached_user_updated(self, client: TestClient):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                            VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address')""",
+            )
+            session.commit()
+        _ = client.get(self.ENDPOINT.format(user_id=mock_uuid(1)))
+
+        data = {
+            "name": "test_user_updated",
+            "phone": "test_phone_updated",
+            "address": "test_address_updated",
+        }
+
+        # Act
+        _ = client.put(self.ENDPOINT.format(user_id=mock_uuid(1)), json=data)
+        response = client.get(self.ENDPOINT.format(user_id=mock_uuid(1)))
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["data"]["name"] == "test_user_updated"
+
     def test_not_found(self, client: TestClient):
         # Arrange
         with DatabaseSession.get(DatabaseId.MAIN) as session:
@@ -292,6 +703,7 @@ class TestDelete:
         with DatabaseSession.get(DatabaseId.MAIN) as session:
             _ = execute_raw_queries(session, "TRUNCATE TABLE main.user CASCADE")
             session.commit()
+        clear_caches()
 
     def test_ok(self, client: TestClient):
         # Arrange
@@ -334,3 +746,194 @@ class TestDelete:
         # Assert
         assert response.status_code == status.HTTP_404_NOT_FOUND
         assert_api_error_format(response)
+
+
+class TestBulkCreate:
+    ENDPOINT = "/api/v4/users/bulk"
+
+    @pytest.fixture(scope="function", autouse=True)
+    def reset_data(self):
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(session, "TRUNCATE TABLE main.user CASCADE")
+            session.commit()
+        clear_caches()
+
+    def test_ok(self, client: TestClient):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                            VALUES ('{mock_uuid(1)}', 'test_user', 'test_exisiting_email', 'test_phone', 'test_address')""",
+            )
+            session.commit()
+
+        data = {
+            "data": [
+                {
+                    "name": "test_user2",
+                    "email": "test_email2",
+                    "phone": "test_phone2",
+                    "address": "test_address2",
+                    "password": "test_password",
+                },
+                {
+                    "name": "test_user3",
+                    "email": "test_exisiting_email",
+                    "phone": "test_phone3",
+                    "address": "test_address3",
+                    "password": "test_password",
+                },
+            ]
+        }
+
+        # Act
+        response = client.post(self.ENDPOINT, json=data)
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()["data"]
+        assert [result["status"] for result in results] == [
+            status.HTTP_201_CREATED,
+            status.HTTP_409_CONFLICT,
+        ]
+        assert results[0]["data"]["email"] == "test_email2"
+        assert "message" in results[1]["error"]
+
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            data = session.get(User, results[0]["data"]["id"])
+
+        assert data.name == "test_user2"
+        assert nacl.pwhash.verify(data.password_hash.encode(), "test_password".encode())
+
+    def test_too_many_items(self, client: TestClient):
+        # Arrange
+        data = {
+            "data": [
+                {
+                    "name": "test_user",
+                    "email": f"test_email{i}",
+                    "phone": "test_phone",
+                    "address": "test_address",
+                    "password": "test_password",
+                }
+                for i in range(101)
+            ]
+        }
+
+        # Act
+        response = client.post(self.ENDPOINT, json=data)
+
+        # Assert
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert_api_error_format(response)
+
+
+class TestBulkUpdate:
+    ENDPOINT = "/api/v4/users/bulk"
+
+    @pytest.fixture(scope="function", autouse=True)
+    def reset_data(self):
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(session, "TRUNCATE TABLE main.user CASCADE")
+            session.commit()
+        clear_caches()
+
+    def test_ok(self, client: TestClient):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                            VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address'),
+                                   ('{mock_uuid(2)}', 'test_user2', 'test_email2', 'test_phone2', 'test_address2')""",
+            )
+            session.commit()
+
+        data = {
+            "data": [
+                {"id": mock_uuid(1), "name": "test_user_updated"},
+                {"id": mock_uuid(2), "phone": "test_phone2_updated"},
+                {"id": mock_uuid(3), "name": "test_user3_updated"},
+            ]
+        }
+
+        # Act
+        response = client.patch(self.ENDPOINT, json=data)
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert [result["status"] for result in response.json()["data"]] == [
+            status.HTTP_200_OK,
+            status.HTTP_200_OK,
+            status.HTTP_404_NOT_FOUND,
+        ]
+
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            data1 = session.get(User, mock_uuid(1))
+            data2 = session.get(User, mock_uuid(2))
+
+        assert data1.name == "test_user_updated"
+        assert data1.phone == "test_phone"
+        assert data2.name == "test_user2"
+        assert data2.phone == "test_phone2_updated"
+
+
+class TestBulkDelete:
+    ENDPOINT = "/api/v4/users/bulk"
+
+    @pytest.fixture(scope="function", autouse=True)
+    def reset_data(self):
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(session, "TRUNCATE TABLE main.user CASCADE")
+            session.commit()
+        clear_caches()
+
+    def test_ok(self, client: TestClient):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                            VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address'),
+                                   ('{mock_uuid(2)}', 'test_user2', 'test_email2', 'test_phone2', 'test_address2')""",
+            )
+            session.commit()
+
+        # Act
+        response = client.request(
+            "DELETE", self.ENDPOINT, json={"data": [mock_uuid(1), mock_uuid(3)]}
+        )
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert [result["status"] for result in response.json()["data"]] == [
+            status.HTTP_200_OK,
+            status.HTTP_404_NOT_FOUND,
+        ]
+
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            assert session.get(User, mock_uuid(1)) is None
+            assert session.get(User, mock_uuid(2)) is not None
+
+    def test_duplicate_id(self, client: TestClient):
+        # Arrange
+        with DatabaseSession.get(DatabaseId.MAIN) as session:
+            _ = execute_raw_queries(
+                session,
+                f"""INSERT INTO main.user (id, name, email, phone, address) 
+                            VALUES ('{mock_uuid(1)}', 'test_user', 'test_email', 'test_phone', 'test_address')""",
+            )
+            session.commit()
+
+        # Act
+        response = client.request(
+            "DELETE", self.ENDPOINT, json={"data": [mock_uuid(1), mock_uuid(1)]}
+        )
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert [result["status"] for result in response.json()["data"]] == [
+            status.HTTP_200_OK,
+            status.HTTP_409_CONFLICT,
+        ]
@@ -0,0 +1,337 @@
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import string
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+import httpx
+
+# Load test of the API: sends the requests of the scenarios at a constant rate (open loop),
+# then reports the throughput and the latency percentiles of each scenario in a JSON file.
+# The latency is measured from the time the request was scheduled, so that a server falling behind
+# shows up in the percentiles instead of slowing down the load (coordinated omission).
+#
+# Run from the tests folder, with src in the PYTHONPATH, against the test containers of docker-compose.yml
+# (or a local server started with --start-server, using the settings.yaml of the working directory):
+#   python -m load_tests.run --scenario list_with_filter --scenario get_by_id --rps 100 --duration 30 \
+#       --seed-users 10000 --report reports/baseline.json
+#   python -m load_tests.run ... --report reports/candidate.json --compare reports/baseline.json
+
+_SCENARIOS_PATH = Path(__file__).parent / "scenarios"
+
+_NAME_FRAGMENTS = ["an", "ar", "el", "er", "in", "jo", "ma", "ri", "son", "th"]
+
+
+@dataclass
+class Scenario:
+    """
+    Request of a scenario file, the strings can contain the placeholders:
+    $user_id (an existing user), $unique (a unique value), $name_fragment (part of a common name)
+    """
+
+    name: str
+    method: str
+    path: str
+    params: dict[str, str] | None = None
+    body: dict[str, Any] | None = None
+    expected_status: int = 200
+    weight: float = 1
+
+    @staticmethod
+    def load(name: str, weight: float = 1) -> "Scenario":
+        return Scenario(
+            **json.loads((_SCENARIOS_PATH / f"{name}.json").read_text()),
+            weight=weight,
+        )
+
+    @property
+    def needs_user_ids(self) -> bool:
+        return "$user_id" in json.dumps([self.path, self.params, self.body])
+
+
+@dataclass
+class _Sample:
+    scenario: str
+    latency_seconds: float
+    ok: bool
+
+
+def _render(value: Any, variables: dict[str, str]) -> Any:
+    if isinstance(value, str):
+        return string.Template(value).substitute(variables)
+    if isinstance(value, dict):
+        return {k: _render(v, variables) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_render(v, variables) for v in value]
+    return value
+
+
+async def _fetch_user_ids(client: httpx.AsyncClient, count: int) -> list[str]:
+    """Ids of existing users, read through the API following the cursors"""
+    user_ids = []
+    params = {"limit": "300", "count": "none"}
+    while len(user_ids) < count:
+        response = await client.get("/api/v4/users", params=params)
+        response.raise_for_status()
+        content = response.json()
+        user_ids.extend(user["id"] for user in content["data"])
+        next_cursor = content["meta"].get("nextCursor")
+        if not next_cursor:
+            break
+        params["after"] = next_cursor
+    return user_ids[:count]
+
+
+async def _send(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    user_ids: list[str],
+    scheduled_time: float,
+    semaphore: asyncio.Semaphore,
+    samples: list[_Sample],
+) -> None:
+    variables = {
+        "user_id": random.choice(user_ids) if user_ids else "",
+        "unique": uuid4().hex,
+        "name_fragment": random.choice(_NAME_FRAGMENTS),
+    }
+    async with semaphore:
+        try:
+            response = await client.request(
+                scenario.method,
+                _render(scenario.path, variables),
+                params=_render(scenario.params, variables),
+                json=_render(scenario.body, variables),
+            )
+            ok = response.status_code == scenario.expected_status
+        except httpx.HTTPError:
+            ok = False
+    samples.append(_Sample(scenario.name, time.perf_counter() - scheduled_time, ok))
+
+
+async def _drive(
+    client: httpx.AsyncClient,
+    scenarios: list[Scenario],
+    user_ids: list[str],
+    rps: float,
+    duration_seconds: float,
+    max_in_flight: int,
+) -> tuple[list[_Sample], float]:
+    samples: list[_Sample] = []
+    semaphore = asyncio.Semaphore(max_in_flight)
+    weights = [scenario.weight for scenario in scenarios]
+
+    tasks = []
+    start_time = time.perf_counter()
+    for i in range(int(rps * duration_seconds)):
+        scheduled_time = start_time + i / rps
+        delay = scheduled_time - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        scenario = random.choices(scenarios, weights)[0]
+        tasks.append(
+            asyncio.create_task(
+                _send(client, scenario, user_ids, scheduled_time, semaphore, samples)
+            )
+        )
+    await asyncio.gather(*tasks)
+    return samples, time.perf_counter() - start_time
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    index = max(0, int(round(percentile / 100 * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+def _summarize(samples: list[_Sample], elapsed_seconds: float) -> dict[str, dict]:
+    results = {}
+    for name in sorted({s.scenario for s in samples}) + ["all"]:
+        scenario_samples = [s for s in samples if name in ("all", s.scenario)]
+        latencies = sorted(s.latency_seconds * 1000 for s in scenario_samples)
+        results[name] = {
+            "requests": len(scenario_samples),
+            "errors": sum(1 for s in scenario_samples if not s.ok),
+            "throughput_rps": round(len(scenario_samples) / elapsed_seconds, 1),
+            "p50_ms": round(_percentile(latencies, 50), 2),
+            "p95_ms": round(_percentile(latencies, 95), 2),
+            "p99_ms": round(_percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2),
+        }
+    return results
+
+
+def _print_results(results: dict[str, dict], previous: dict[str, dict] | None) -> None:
+    columns = ["requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms"]
+    print(f"{'scenario':18}" + "".join(f"{c:>24}" for c in columns))
+    for name, result in results.items():
+        cells = []
+        for column in columns:
+            cell = f"{result[column]}"
+            previous_value = (previous or {}).get(name, {}).get(column)
+            if previous_value:
+                cell += f" ({result[column] / previous_value - 1:+.0%})"
+            cells.append(f"{cell:>24}")
+        print(f"{name:18}" + "".join(cells))
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _start_server(port: int, workers: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:fastapi_app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ]
+    )
+
+
+async def _wait_for_server(client: httpx.AsyncClient, timeout_seconds: float) -> None:
+    deadline = time.perf_counter() + timeout_seconds
+    while True:
+        try:
+            (await client.get("/api/v4/server-info")).raise_for_status()
+            return
+        except httpx.HTTPError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def _parse_scenario_argument(argument: str) -> Scenario:
+    name, _, weight = argument.partition(":")
+    return Scenario.load(name, float(weight) if weight else 1)
+
+
+async def run(args: argparse.Namespace) -> None:
+    scenarios = [_parse_scenario_argument(argument) for argument in args.scenario]
+
+    if args.seed_users:
+        # Imported here, so that only the seeding needs the database settings
+        from utils.seed_database import seed_users
+
+        await seed_users(args.seed_users)
+
+    server = _start_server(args.port, args.workers) if args.start_server else None
+    base_url = f"http://localhost:{args.port}" if server else args.base_url
+    try:
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=args.max_in_flight),
+        ) as client:
+            await _wait_for_server(client, 30)
+
+            user_ids = []
+            if any(scenario.needs_user_ids for scenario in scenarios):
+                user_ids = await _fetch_user_ids(client, args.user_id_sample)
+                if not user_ids:
+                    raise RuntimeError("No users found, seed them with --seed-users")
+
+            samples, elapsed_seconds = await _drive(
+                client,
+                scenarios,
+                user_ids,
+                args.rps,
+                args.duration,
+                args.max_in_flight,
+            )
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    results = _summarize(samples, elapsed_seconds)
+    previous = (
+        json.loads(Path(args.compare).read_text())["results"] if args.compare else None
+    )
+    _print_results(results, previous)
+
+    if args.report:
+        report_path = Path(args.report)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+            "git_commit": _git_commit(),
+            "config": {
+                "scenarios": args.scenario,
+                "rps": args.rps,
+                "duration_seconds": args.duration,
+                "max_in_flight": args.max_in_flight,
+                "workers": args.workers if server else None,
+            },
+            "results": results,
+        }
+        report_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Report written to {report_path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        required=True,
+        help="scenario file name in load_tests/scenarios, optionally with a weight (e.g. get_by_id:3)",
+    )
+    parser.add_argument("--rps", type=float, default=50, help="requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=100,
+        help="maximum concurrent requests, the others wait (and the wait counts in their latency)",
+    )
+    parser.add_argument("--timeout", type=float, default=30, help="request timeout")
+    parser.add_argument("--base-url", default="http://localhost:19191")
+    parser.add_argument(
+        "--start-server",
+        action="store_true",
+        help="start uvicorn on --port instead of using --base-url",
+    )
+    parser.add_argument("--port", type=int, default=9191)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--seed-users",
+        type=int,
+        default=0,
+        help="users to add to the database before the test",
+    )
+    parser.add_argument(
+        "--user-id-sample",
+        type=int,
+        default=1000,
+        help="existing users used by the $user_id placeholder",
+    )
+    parser.add_argument("--report", help="JSON report file")
+    parser.add_argument("--compare", help="previous JSON report file to compare with")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
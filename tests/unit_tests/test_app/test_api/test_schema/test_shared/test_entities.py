@@ -0,0 +1,56 @@
+import datetime
+import uuid
+
+import pytest
+from sqlalchemy import Column, DateTime, MetaData, Table, Uuid, select
+from sqlalchemy.dialects.postgresql import psycopg
+
+from app.api.schema.shared.entities import BaseEntitySchema
+from app.api.schema.shared.pagination import encode_cursor
+from system.query_builder import Asc, Field
+
+_event = Table(
+    "event",
+    MetaData(schema="main"),
+    Column("id", Uuid, primary_key=True),
+    Column("created_at", DateTime(timezone=True)),
+)
+
+
+class _EventSchema(BaseEntitySchema):
+    created_at: datetime.datetime
+
+    @staticmethod
+    def get_query_builder_fields() -> list[Field]:
+        return [
+            Field("id", _event.c.id),
+            Field("created_at", _event.c.created_at),
+        ]
+
+
+def _compile(query) -> str:
+    # The psycopg dialect renders the casts of the bound parameters, as sent to Postgres
+    return str(query.compile(dialect=psycopg.dialect()))
+
+
+class TestBuildQuery:
+    @pytest.mark.parametrize("cursor_direction", ["after", "before"])
+    def test_seek_params_typed_after_columns(self, cursor_direction: str):
+        # Arrange
+        cursor = encode_cursor(
+            [datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC), str(uuid.uuid4())]
+        )
+
+        # Act
+        query = _EventSchema.build_query(
+            select(_event.c.id),
+            limit=10,
+            order_by=[Asc(field="created_at")],
+            **{cursor_direction: cursor},
+        )
+
+        # Assert
+        sql = _compile(query)
+        assert "::VARCHAR" not in sql
+        assert "%(created_at_0)s::TIMESTAMP WITH TIME ZONE" in sql
+        assert "%(id_0)s::UUID" in sql
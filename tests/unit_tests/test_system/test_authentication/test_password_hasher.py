@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from system.authentication.password_hasher import (
+    PasswordHasher,
+    PasswordHasherBusyError,
+    shutdown_password_hasher,
+)
+from system.authentication.settings import PasswordHashingSettings
+
+
+@pytest.fixture
+def release():
+    """Event releasing the jobs blocked in the executor, set before the executor shuts down"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+@pytest.fixture
+def password_hasher(release: threading.Event):
+    yield PasswordHasher(PasswordHashingSettings(max_workers=1, max_queue_size=0))
+    release.set()
+    shutdown_password_hasher()
+
+
+class TestRun:
+    @pytest.mark.asyncio
+    async def test_busy(
+        self, password_hasher: PasswordHasher, release: threading.Event
+    ):
+        # Arrange
+        job = asyncio.create_task(password_hasher._run(release.wait))
+        await asyncio.sleep(0.05)
+
+        # Act
+        # Assert
+        with pytest.raises(PasswordHasherBusyError):
+            # Bounded, so that a job queued by mistake fails the test rather than waiting for the blocked one
+            await asyncio.wait_for(password_hasher._run(lambda: True), 1)
+
+        release.set()
+        await job
+
+    @pytest.mark.asyncio
+    async def test_cancelled_job_keeps_slot_until_done(
+        self, password_hasher: PasswordHasher, release: threading.Event
+    ):
+        # Arrange
+        job = asyncio.create_task(password_hasher._run(release.wait))
+        await asyncio.sleep(0.05)
+
+        # Act
+        job.cancel()
+        await asyncio.gather(job, return_exceptions=True)
+
+        # Assert
+        # The job is still running in the executor
+        with pytest.raises(PasswordHasherBusyError):
+            # Bounded, so that a job queued by mistake fails the test rather than waiting for the blocked one
+            await asyncio.wait_for(password_hasher._run(lambda: True), 1)
+
+        release.set()
+        await asyncio.sleep(0.05)
+        assert await password_hasher._run(lambda: True)
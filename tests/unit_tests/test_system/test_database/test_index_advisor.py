@@ -0,0 +1,144 @@
+from system.database.index_advisor import (
+    IndexKind,
+    IndexSuggestion,
+    parse_operator_usage,
+    suggest_indexes,
+    _is_indexed,
+)
+
+
+class _FakeInspector:
+    def __init__(self, indexes: list[dict], primary_key_columns: list[str]):
+        self.indexes = indexes
+        self.primary_key_columns = primary_key_columns
+
+    def get_indexes(self, table_name: str, schema: str | None = None) -> list[dict]:
+        return self.indexes
+
+    def get_pk_constraint(self, table_name: str, schema: str | None = None) -> dict:
+        return {"constrained_columns": self.primary_key_columns}
+
+
+class TestParseOperatorUsage:
+    def test_ok(self):
+        # Arrange
+        metrics_text = "\n".join(
+            [
+                "# HELP query_builder_operator_usage_total Operators of the query builder rules",
+                "# TYPE query_builder_operator_usage_total counter",
+                'query_builder_operator_usage_total{table="main.user",column="name",operator="icontains"} 12.0',
+                'query_builder_operator_usage_total{table="main.user",column="email",operator="equal"} 3.0',
+                'http_requests_total{method="GET",route="/api/v4/users",status="200"} 15.0',
+            ]
+        )
+
+        # Act
+        usage = parse_operator_usage(metrics_text)
+
+        # Assert
+        assert usage == {
+            ("main.user", "name", "icontains"): 12,
+            ("main.user", "email", "equal"): 3,
+        }
+
+    def test_escaped_label_value(self):
+        # Arrange
+        metrics_text = 'query_builder_operator_usage_total{table="main.user",column="na\\"me",operator="equal"} 1.0'
+
+        # Act
+        usage = parse_operator_usage(metrics_text)
+
+        # Assert
+        assert usage == {("main.user", 'na"me', "equal"): 1}
+
+
+class TestSuggestIndexes:
+    def test_operators_mapped_to_index_kinds(self):
+        # Arrange
+        usage = {
+            ("main.user", "name", "icontains"): 60,
+            ("main.user", "name", "endswith"): 50,
+            ("main.user", "email", "iequal"): 200,
+            ("main.user", "email", "equal"): 70,
+            ("main.user", "email", "sort"): 40,
+        }
+
+        # Act
+        suggestions = suggest_indexes(usage, min_count=100)
+
+        # Assert
+        assert [(s.column, s.kind, s.usage_count) for s in suggestions] == [
+            ("email", IndexKind.LOWER, 200),
+            ("name", IndexKind.TRIGRAM, 110),
+            ("email", IndexKind.BTREE, 110),
+        ]
+
+    def test_operators_without_index_skipped(self):
+        # Arrange
+        usage = {
+            ("main.user", "name", "notequal"): 1000,
+            ("main.user", "name", "isnull"): 1000,
+        }
+
+        # Act
+        suggestions = suggest_indexes(usage, min_count=100)
+
+        # Assert
+        assert suggestions == []
+
+    def test_create_sql(self):
+        # Arrange
+        suggestion = IndexSuggestion("main.user", "name", IndexKind.TRIGRAM, 100)
+
+        # Act
+        create_sql = suggestion.create_sql()
+
+        # Assert
+        assert (
+            create_sql
+            == 'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_name_trgm ON main."user" USING gin (name gin_trgm_ops)'
+        )
+
+
+class TestIsIndexed:
+    def test_index_with_same_name(self):
+        # Arrange
+        suggestion = IndexSuggestion("main.user", "name", IndexKind.TRIGRAM, 100)
+        inspector = _FakeInspector(
+            [{"name": "ix_user_name_trgm", "column_names": [None]}], ["id"]
+        )
+
+        # Act
+        # Assert
+        assert _is_indexed(suggestion, inspector)
+
+    def test_btree_served_by_leading_column(self):
+        # Arrange
+        suggestion = IndexSuggestion("main.user", "email", IndexKind.BTREE, 100)
+        inspector = _FakeInspector(
+            [{"name": "user_email_key", "column_names": ["email", "name"]}], ["id"]
+        )
+
+        # Act
+        # Assert
+        assert _is_indexed(suggestion, inspector)
+
+    def test_btree_served_by_primary_key(self):
+        # Arrange
+        suggestion = IndexSuggestion("main.user", "id", IndexKind.BTREE, 100)
+        inspector = _FakeInspector([], ["id"])
+
+        # Act
+        # Assert
+        assert _is_indexed(suggestion, inspector)
+
+    def test_not_indexed(self):
+        # Arrange
+        suggestion = IndexSuggestion("main.user", "name", IndexKind.TRIGRAM, 100)
+        inspector = _FakeInspector(
+            [{"name": "ix_user_name", "column_names": ["name"]}], ["id"]
+        )
+
+        # Act
+        # Assert
+        assert not _is_indexed(suggestion, inspector)
@@ -0,0 +1,70 @@
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from system.database.query_timing import (
+    QUERY_FINGERPRINT_OPTION,
+    instrument_engine,
+    _redact_parameters,
+)
+
+
+class TestInstrumentEngine:
+    def test_slow_query_logged_redacted(self, caplog: pytest.LogCaptureFixture):
+        # Arrange
+        engine = create_engine("sqlite://")
+        instrument_engine(engine, "test", slow_query_threshold_ms=0)
+
+        # Act
+        with caplog.at_level(logging.WARNING, logger="system.database.query_timing"):
+            with engine.connect() as connection:
+                connection.execute(
+                    text("SELECT :password").execution_options(
+                        **{QUERY_FINGERPRINT_OPTION: "fingerprint"}
+                    ),
+                    {"password": "secret-password"},
+                )
+
+        # Assert
+        messages = [record.getMessage() for record in caplog.records]
+        assert any(
+            "Slow query" in message
+            and "fingerprint fingerprint" in message
+            and "SELECT ?" in message
+            and "['str']" in message
+            for message in messages
+        )
+        assert not any("secret-password" in message for message in messages)
+
+    def test_fast_query_not_logged(self, caplog: pytest.LogCaptureFixture):
+        # Arrange
+        engine = create_engine("sqlite://")
+        instrument_engine(engine, "test", slow_query_threshold_ms=60_000)
+
+        # Act
+        with caplog.at_level(logging.WARNING, logger="system.database.query_timing"):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+
+        # Assert
+        assert not any("Slow query" in r.getMessage() for r in caplog.records)
+
+
+class TestRedactParameters:
+    @pytest.mark.parametrize(
+        "parameters, expected",
+        [
+            (
+                {"email": "user@example.com", "limit": 10},
+                {"email": "str", "limit": "int"},
+            ),
+            (("user@example.com", None), ["str", "NoneType"]),
+            ([{"email": "a"}, {"email": "b"}], "<2 parameter sets>"),
+        ],
+    )
+    def test_ok(self, parameters, expected):
+        # Arrange
+        # Act
+        # Assert
+        assert _redact_parameters(parameters) == expected
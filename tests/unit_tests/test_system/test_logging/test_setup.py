@@ -0,0 +1,156 @@
+import io
+import json
+import logging
+import queue
+import sys
+import threading
+
+import pytest
+
+from system.logging import setup
+from system.logging.settings import (
+    LoggingQueueFullPolicy,
+    LoggingQueueSettings,
+    LoggingSettings,
+)
+
+_PLAIN_FORMAT = LoggingSettings.model_fields["format"].default
+
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger("test_logging_setup")
+    logger.propagate = False
+    yield logger
+    setup.shutdown_logging()
+    logger.handlers.clear()
+
+
+def _build_stream_handler(
+    formatter: logging.Formatter,
+) -> tuple[logging.Handler, io.StringIO]:
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(formatter)
+    return handler, stream
+
+
+def _build_record(message: str = "message", exc_info=None) -> logging.LogRecord:
+    return logging.getLogger("test").makeRecord(
+        "test", logging.ERROR, __file__, 1, message, (), exc_info
+    )
+
+
+def _get_exc_info():
+    try:
+        raise ValueError("invalid value")
+    except ValueError:
+        return sys.exc_info()
+
+
+class TestBoundedQueueHandler:
+    def test_drop_policy(self):
+        # Arrange
+        log_queue = queue.Queue(maxsize=1)
+        handler = setup._BoundedQueueHandler(log_queue, LoggingQueueFullPolicy.DROP)
+
+        # Act
+        for i in range(3):
+            handler.handle(_build_record(f"message {i}"))
+
+        # Assert
+        assert handler.dropped_records == 2
+        assert log_queue.qsize() == 1
+        assert log_queue.get_nowait().getMessage() == "message 0"
+
+    def test_block_policy(self):
+        # Arrange
+        log_queue = queue.Queue(maxsize=1)
+        handler = setup._BoundedQueueHandler(log_queue, LoggingQueueFullPolicy.BLOCK)
+        handler.handle(_build_record("message 0"))
+
+        # Act
+        thread = threading.Thread(
+            target=handler.handle, args=(_build_record("message 1"),)
+        )
+        thread.start()
+        thread.join(0.1)
+        blocked = thread.is_alive()
+        first_record = log_queue.get()
+        thread.join(1)
+
+        # Assert
+        assert blocked
+        assert not thread.is_alive()
+        assert handler.dropped_records == 0
+        assert first_record.getMessage() == "message 0"
+        assert log_queue.get_nowait().getMessage() == "message 1"
+
+    def test_prepare_keeps_exception(self):
+        # Arrange
+        handler = setup._BoundedQueueHandler(queue.Queue(), LoggingQueueFullPolicy.DROP)
+        exc_info = _get_exc_info()
+
+        # Act
+        record = handler.prepare(_build_record("failed %s", exc_info))
+
+        # Assert
+        assert record.exc_info == exc_info
+        assert record.msg == "failed %s"
+        assert record.args is None
+        assert "Traceback" not in record.getMessage()
+
+
+class TestJsonFormatter:
+    def test_ok(self):
+        # Arrange
+        record = _build_record("failed", _get_exc_info())
+        record.request_id = "REQ_1"
+        record.route = "/api/v4/users"
+        record.latency_ms = None
+
+        # Act
+        data = json.loads(setup._JsonFormatter().format(record))
+
+        # Assert
+        assert data["level"] == "ERROR"
+        assert data["logger"] == "test"
+        assert data["message"] == "failed"
+        assert data["request_id"] == "REQ_1"
+        assert data["route"] == "/api/v4/users"
+        assert "latency_ms" not in data
+        assert "ValueError: invalid value" in data["exception"]
+
+    def test_queued_record(self, logger: logging.Logger):
+        # Arrange
+        handler, stream = _build_stream_handler(setup._JsonFormatter())
+        setup._install_handlers(logger, [handler], LoggingQueueSettings())
+
+        # Act
+        try:
+            raise ValueError("invalid value")
+        except ValueError:
+            logger.exception("Failed for %s", "user")
+        setup.shutdown_logging()
+
+        # Assert
+        data = json.loads(stream.getvalue())
+        assert data["message"] == "Failed for user"
+        assert "ValueError: invalid value" in data["exception"]
+
+
+class TestShutdownLogging:
+    def test_dropped_records_reported(self, logger: logging.Logger):
+        # Arrange
+        handler, stream = _build_stream_handler(logging.Formatter(_PLAIN_FORMAT))
+        setup._install_handlers(logger, [handler], LoggingQueueSettings())
+        setup._queue_handler.dropped_records = 3
+
+        # Act
+        setup.shutdown_logging()
+
+        # Assert
+        assert (
+            "WARNING [None] root: Dropped 3 log records, the logging queue was full"
+            in stream.getvalue()
+        )
@@ -0,0 +1,91 @@
+from system.metrics.registry import MetricsRegistry, merge_snapshots, render_text
+
+
+def _build_registry(
+    requests: int, latencies: list[float], route: str = "/api/v4/users"
+) -> MetricsRegistry:
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests", ("route",))
+    histogram = registry.histogram(
+        "latency_seconds", "Latency", ("route",), buckets=[0.1, 1]
+    )
+    counter.inc((route,), requests)
+    for latency in latencies:
+        histogram.observe((route,), latency)
+    return registry
+
+
+class TestMergeSnapshots:
+    def test_ok(self):
+        # Arrange
+        snapshots = [
+            _build_registry(2, [0.05, 0.5]).snapshot(),
+            _build_registry(3, [0.5, 5]).snapshot(),
+            _build_registry(1, [], route="/api/v4/server-info").snapshot(),
+        ]
+
+        # Act
+        merged = merge_snapshots(snapshots)
+
+        # Assert
+        assert merged["requests_total"]["samples"] == [
+            [["/api/v4/users"], 5],
+            [["/api/v4/server-info"], 1],
+        ]
+        assert merged["latency_seconds"]["samples"] == [
+            [["/api/v4/users"], [[1, 2, 1], 6.05, 4]],
+        ]
+
+    def test_different_buckets_skipped(self):
+        # Arrange
+        registry = MetricsRegistry()
+        histogram = registry.histogram(
+            "latency_seconds", "Latency", ("route",), buckets=[1]
+        )
+        histogram.observe(("/api/v4/users",), 0.5)
+        snapshots = [_build_registry(0, [0.5]).snapshot(), registry.snapshot()]
+
+        # Act
+        merged = merge_snapshots(snapshots)
+
+        # Assert
+        assert merged["latency_seconds"]["buckets"] == [0.1, 1]
+        assert merged["latency_seconds"]["samples"] == [
+            [["/api/v4/users"], [[0, 1, 0], 0.5, 1]],
+        ]
+
+
+class TestRenderText:
+    def test_histogram(self):
+        # Arrange
+        snapshot = _build_registry(1, [0.05, 0.5, 5]).snapshot()
+
+        # Act
+        text = render_text(snapshot)
+
+        # Assert
+        assert text.splitlines() == [
+            "# HELP requests_total Requests",
+            "# TYPE requests_total counter",
+            'requests_total{route="/api/v4/users"} 1',
+            "# HELP latency_seconds Latency",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{route="/api/v4/users",le="0.1"} 1',
+            'latency_seconds_bucket{route="/api/v4/users",le="1"} 2',
+            'latency_seconds_bucket{route="/api/v4/users",le="+Inf"} 3',
+            'latency_seconds_sum{route="/api/v4/users"} 5.55',
+            'latency_seconds_count{route="/api/v4/users"} 3',
+        ]
+
+    def test_label_escaping(self):
+        # Arrange
+        registry = MetricsRegistry()
+        registry.counter("values_total", "Values", ("value",)).inc(
+            ('a "quoted"\\path\nline',)
+        )
+
+        # Act
+        text = render_text(registry.snapshot())
+
+        # Assert
+        assert 'values_total{value="a \\"quoted\\"\\\\path\\nline"} 1' in text
@@ -0,0 +1,73 @@
+import pytest
+from pydantic import SecretStr
+
+from system.middleware.profiling import ProfilingMiddleware
+from system.profiling.settings import ProfilingSettings
+
+
+def _build_scope(profile_header: str | None = None) -> dict:
+    headers = []
+    if profile_header is not None:
+        headers.append((b"x-profile", profile_header.encode()))
+    return {"type": "http", "headers": headers}
+
+
+async def _app(scope, receive, send):
+    pass
+
+
+class TestShouldProfile:
+    def test_token_matching(self):
+        # Arrange
+        middleware = ProfilingMiddleware(
+            _app, ProfilingSettings(token=SecretStr("secret"))
+        )
+
+        # Act
+        # Assert
+        assert middleware._should_profile(_build_scope("secret"))
+
+    def test_token_not_matching(self):
+        # Arrange
+        middleware = ProfilingMiddleware(
+            _app, ProfilingSettings(token=SecretStr("secret"), sample_rate=1)
+        )
+
+        # Act
+        # Assert
+        assert not middleware._should_profile(_build_scope("other"))
+
+    def test_header_without_token(self):
+        # Arrange
+        middleware = ProfilingMiddleware(_app, ProfilingSettings())
+
+        # Act
+        # Assert
+        assert not middleware._should_profile(_build_scope("secret"))
+
+    @pytest.mark.parametrize(
+        "random_value, expected", [(0.24, True), (0.25, False), (0.9, False)]
+    )
+    def test_sample_rate(
+        self, monkeypatch: pytest.MonkeyPatch, random_value: float, expected: bool
+    ):
+        # Arrange
+        monkeypatch.setattr(
+            "system.middleware.profiling.random.random", lambda: random_value
+        )
+        middleware = ProfilingMiddleware(_app, ProfilingSettings(sample_rate=0.25))
+
+        # Act
+        # Assert
+        assert middleware._should_profile(_build_scope()) == expected
+
+    def test_already_profiling(self):
+        # Arrange
+        middleware = ProfilingMiddleware(
+            _app, ProfilingSettings(token=SecretStr("secret"))
+        )
+        middleware._profiling = True
+
+        # Act
+        # Assert
+        assert not middleware._should_profile(_build_scope("secret"))
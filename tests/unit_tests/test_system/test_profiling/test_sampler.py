@@ -0,0 +1,60 @@
+import sys
+from collections import Counter
+
+from system.profiling.sampler import _collapse_stack, format_collapsed_stacks
+
+
+class TestCollapseStack:
+    def test_ok(self):
+        # Arrange
+        def outer():
+            return inner()
+
+        def inner():
+            return sys._getframe()
+
+        frame = outer()
+
+        # Act
+        stack = _collapse_stack(frame)
+
+        # Assert
+        frames = stack.split(";")
+        assert frames[-2:] == [
+            f"TestCollapseStack.test_ok.<locals>.outer (test_sampler.py:{outer.__code__.co_firstlineno})",
+            f"TestCollapseStack.test_ok.<locals>.inner (test_sampler.py:{inner.__code__.co_firstlineno})",
+        ]
+        assert frames[-3].startswith("TestCollapseStack.test_ok (test_sampler.py:")
+
+    def test_no_frame(self):
+        # Arrange
+        # Act
+        stack = _collapse_stack(None)
+
+        # Assert
+        assert stack == ""
+
+
+class TestFormatCollapsedStacks:
+    def test_ok(self):
+        # Arrange
+        samples = Counter(
+            {"main (app.py:1);a (app.py:5)": 1, "main (app.py:1);b (app.py:9)": 3}
+        )
+
+        # Act
+        content = format_collapsed_stacks(samples)
+
+        # Assert
+        assert (
+            content
+            == "main (app.py:1);b (app.py:9) 3\nmain (app.py:1);a (app.py:5) 1\n"
+        )
+
+    def test_no_samples(self):
+        # Arrange
+        # Act
+        content = format_collapsed_stacks(Counter())
+
+        # Assert
+        assert content == ""
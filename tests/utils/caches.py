@@ -0,0 +1,31 @@
+from redis import Redis
+
+from system.redis import entity_cache
+from system.settings import get_redis_settings
+
+
+def build_redis() -> Redis:
+    """
+    Build a synchronous connection to the Redis database of the tests.
+    """
+    settings = get_redis_settings()
+    return Redis(
+        host=settings.host,
+        port=settings.port,
+        db=settings.db,
+        username=settings.username,
+        password=(settings.password.get_secret_value() if settings.password else None),
+    )
+
+
+def clear_caches() -> None:
+    """
+    Empty the Redis database and the in-process entity cache, so that a test cannot read the data cached by another.
+    """
+    with build_redis() as redis:
+        redis.flushdb()
+
+    # noinspection PyProtectedMember
+    if entity_cache._local_cache is not None:
+        # noinspection PyProtectedMember
+        entity_cache._local_cache.clear()
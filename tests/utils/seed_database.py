@@ -1,43 +1,121 @@
 import asyncio
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, Future
 
+import nacl.pwhash
 from faker import Faker
-from sqlmodel import Session
 from uuid6 import uuid7
 
-from app.core.models.main.user import User
 from system.database.session import get_database_engine
 from system.database.settings import DatabaseId
 from system.logging.setup import init_logging
 
-import nacl.pwhash
+# Rows are generated by a pool of processes (Faker is the bottleneck) and written with a binary COPY,
+# in batches, while the next batches are being generated.
+#
+# Run from the tests folder, with src in the PYTHONPATH:
+#   python -m utils.seed_database 1000000
 
+SEED_PASSWORD = "seed-password"
+"""Password of all the seeded users"""
 
-async def seed_users(count: int, batch_size: int | None = None) -> None:
-    logger = init_logging()
+_COPY_USERS = (
+    'COPY main."user" (id, name, email, phone, address, password_hash) '
+    "FROM STDIN (FORMAT BINARY)"
+)
+_COPY_USERS_TYPES = ["uuid", "varchar", "varchar", "varchar", "varchar", "varchar"]
+
+
+_FAKE_VALUES_POOL_SIZE = 1000
+"""Values generated by Faker for each batch, combined at random to build the rows"""
+
+
+def _generate_users(count: int, password_hash: str) -> list[tuple]:
+    # Faker takes hundreds of microseconds for a name or an address, so it generates the parts
+    # of the values once per batch: 1000 first names and 1000 last names still give 1M different names
+    fake = Faker()
+    pool = range(_FAKE_VALUES_POOL_SIZE)
+    first_names = [fake.first_name() for _ in pool]
+    last_names = [fake.last_name() for _ in pool]
+    street_addresses = [fake.street_address() for _ in pool]
+    cities = [f"{fake.city()}, {fake.state_abbr()} {fake.postcode()}" for _ in pool]
+    phone_numbers = [fake.phone_number() for _ in pool]
+    email_domains = list({fake.free_email_domain() for _ in pool})
+
+    choice = random.choice
+    rows = []
+    for _ in range(count):
+        user_id = uuid7()
+        rows.append(
+            (
+                user_id,
+                f"{choice(first_names)} {choice(last_names)}",
+                f"{user_id}@{choice(email_domains)}",
+                choice(phone_numbers),
+                f"{choice(street_addresses)}\n{choice(cities)}",
+                password_hash,
+            )
+        )
+    return rows
 
-    if batch_size:
-        for _ in range(count // batch_size):
-            await seed_users(batch_size)
-        return
 
+def _copy_users(rows: list[tuple]) -> None:
     engine = get_database_engine(DatabaseId.MAIN)
-    with Session(engine) as database_session:
-        fake = Faker()
-
-        for i in range(count):
-            user_id = uuid7()
-            user = User(
-                id=user_id,
-                name=fake.name(),
-                email=f"{user_id}@{fake.free_email_domain()}",
-                phone=fake.phone_number(),
-                address=fake.address(),
-                password_hash=nacl.pwhash.str(str(user_id).encode()).decode(),
+    # Begun by SQLAlchemy, so that the copy on the driver connection is committed when the block exits
+    # (connect() would not begin a transaction, and the pool would roll the copy back)
+    with engine.begin() as connection:
+        driver_connection = connection.connection.driver_connection
+        with driver_connection.cursor() as cursor:
+            with cursor.copy(_COPY_USERS) as copy:
+                copy.set_types(_COPY_USERS_TYPES)
+                for row in rows:
+                    copy.write_row(row)
+
+
+async def seed_users(
+    count: int, batch_size: int | None = None, workers: int | None = None
+) -> None:
+    """
+    Add count users to the main database, all with the password SEED_PASSWORD.
+    :param count: number of users
+    :param batch_size: rows generated by a process and copied in a transaction, 10000 by default
+    :param workers: processes generating the rows, the number of CPUs by default
+    """
+    logger = init_logging()
+
+    batch_size = batch_size or 10_000
+    workers = workers or os.cpu_count() or 1
+    # The hash is computed once: Argon2 is slow by design and the users are synthetic
+    password_hash = nacl.pwhash.str(SEED_PASSWORD.encode()).decode()
+
+    start_time = time.perf_counter()
+    seeded = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: list[Future] = []
+        remaining = count
+        while remaining or pending:
+            # Bounded number of generated batches waiting to be copied
+            while remaining and len(pending) < workers * 2:
+                batch_count = min(batch_size, remaining)
+                pending.append(
+                    executor.submit(_generate_users, batch_count, password_hash)
+                )
+                remaining -= batch_count
+
+            rows = await asyncio.wrap_future(pending.pop(0))
+            await asyncio.to_thread(_copy_users, rows)
+            seeded += len(rows)
+            logger.info(
+                "Seeded users %d/%d (%.0f rows/s)",
+                seeded,
+                count,
+                seeded / (time.perf_counter() - start_time),
             )
-            database_session.add(user)
-            logger.info(f"Seeded user {i + 1}/{count}: {user}")
-        database_session.commit()
 
 
 if __name__ == "__main__":
-    asyncio.run(seed_users(1_000, 500))
+    import sys
+
+    asyncio.run(seed_users(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000))